@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from .models import OutboxMessage
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'subject',
+        'recipients',
+        'status',
+        'attempts',
+        'next_attempt',
+        'sent',
+    )
+    list_filter = ('status',)
+    search_fields = ('recipients', 'subject')
+    readonly_fields = ('data', 'last_error', 'claimed_by')
+
+
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
@@ -0,0 +1,65 @@
+"""Настройка соединений с базой.
+
+Каждому новому соединению с SQLite задаются PRAGMA из профиля
+`DB_PROFILE`. Профиль `production` рассчитан на несколько процессов:
+WAL позволяет читать во время записи, `busy_timeout` заставляет
+писателя ждать блокировку, а не сразу падать с `database is locked`.
+
+Соединения живут `CONN_MAX_AGE` секунд. Перед запросом соединение,
+которое простаивало дольше `DB_HEALTH_CHECK_INTERVAL`, проверяется
+запросом `SELECT 1` и закрывается, если база его уже не принимает.
+"""
+import logging
+import time
+from contextlib import suppress
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def pragmas():
+    return settings.SQLITE_PROFILES[settings.DB_PROFILE]['pragmas']
+
+
+def apply_pragmas(connection, values=None):
+    """Выполняет PRAGMA на соединении SQLite."""
+    values = dict(pragmas() if values is None else values)
+    with connection.cursor() as cursor:
+        journal_mode = values.pop('journal_mode', None)
+        if journal_mode is not None:
+            # Режим журнала хранится в файле базы, а его смена требует
+            # монопольной блокировки: меняем его, только если он другой.
+            cursor.execute('PRAGMA journal_mode')
+            if cursor.fetchone()[0].lower() != journal_mode.lower():
+                cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        for name, value in values.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик `connection_created`."""
+    connection.last_used = time.monotonic()
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection)
+
+
+def check_connections(**kwargs):
+    """Обработчик `request_started`: отбрасывает негодные соединения."""
+    interval = settings.DB_HEALTH_CHECK_INTERVAL
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if now - getattr(connection, 'last_used', now) > interval:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except DatabaseError:
+                logger.warning(
+                    'Соединение %s недоступно и закрыто', connection.alias
+                )
+                with suppress(DatabaseError):
+                    connection.close()
+        connection.last_used = now
@@ -0,0 +1,183 @@
+"""Очередь исходящих писем.
+
+`OutboxBackend` вместо отправки сохраняет письма в `OutboxMessage`: это
+одна вставка в базу, и запрос, например сброс пароля, не ждёт почтовый
+сервер. Письмо, отправленное внутри транзакции, попадает в очередь
+только вместе с её коммитом.
+
+Команда `send_outbox` отправляет письма пачками через
+`OUTBOX_EMAIL_BACKEND`, открывая одно соединение на пачку. Письмо,
+которое не удалось отправить, откладывается с паузой, растущей вдвое с
+каждой попыткой, а после `OUTBOX_MAX_ATTEMPTS` неудач помечается как
+неотправленное. Пачка сначала закрепляется за обработчиком на
+`OUTBOX_LEASE` секунд, поэтому несколько одновременно запущенных команд
+не отправят одно письмо дважды; если обработчик упал посреди пачки,
+письма из неё после этого срока будут отправлены снова.
+"""
+import base64
+import json
+import logging
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def serialize(message):
+    """JSON с полями письма, достаточными, чтобы собрать его заново."""
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError('Готовые MIME-вложения в очередь не попадают')
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            [filename, base64.b64encode(content).decode(), mimetype]
+        )
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'content_subtype': message.content_subtype,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    }, ensure_ascii=False)
+
+
+def deserialize(data):
+    data = json.loads(data)
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        alternatives=[tuple(item) for item in data['alternatives']],
+    )
+    message.content_subtype = data['content_subtype']
+    for filename, content, mimetype in data['attachments']:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Складывает письма в очередь вместо отправки."""
+
+    def send_messages(self, email_messages):
+        rows = [
+            OutboxMessage(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients()),
+                data=serialize(message),
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        OutboxMessage.objects.bulk_create(rows)
+        return len(rows)
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой после `attempts` неудачных."""
+    return min(
+        settings.OUTBOX_RETRY_MAX,
+        settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1),
+    )
+
+
+def claim(batch_size, now):
+    """Закрепляет за обработчиком пачку писем, которые пора отправить."""
+    token = uuid.uuid4().hex
+    due = OutboxMessage.objects.filter(
+        status=OutboxMessage.PENDING, next_attempt__lte=now
+    )
+    ids = list(due.values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # Условие повторяется в UPDATE: письма, которые успел закрепить
+    # другой обработчик, сюда уже не попадут.
+    due.filter(id__in=ids).update(
+        claimed_by=token,
+        next_attempt=now + timedelta(seconds=settings.OUTBOX_LEASE),
+    )
+    return list(OutboxMessage.objects.filter(id__in=ids, claimed_by=token))
+
+
+def fail(outbox, error, now):
+    outbox.attempts += 1
+    outbox.last_error = f'{type(error).__name__}: {error}'
+    if outbox.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        outbox.status = OutboxMessage.FAILED
+    else:
+        outbox.next_attempt = now + timedelta(
+            seconds=retry_delay(outbox.attempts)
+        )
+    outbox.save(update_fields=['attempts', 'last_error', 'status',
+                               'next_attempt'])
+    logger.warning(
+        'Письмо %s не отправлено (попытка %d): %s',
+        outbox.pk, outbox.attempts, outbox.last_error,
+    )
+    return 'failed' if outbox.status == OutboxMessage.FAILED else 'retried'
+
+
+def deliver(batch_size=None, now=None):
+    """Отправляет одну пачку писем и возвращает счётчики исходов."""
+    now = now or timezone.now()
+    messages = claim(batch_size or settings.OUTBOX_BATCH_SIZE, now)
+    stats = Counter()
+    if not messages:
+        return stats
+    connection = get_connection(
+        settings.OUTBOX_EMAIL_BACKEND, fail_silently=False
+    )
+    try:
+        connection.open()
+    except Exception as error:
+        for outbox in messages:
+            stats[fail(outbox, error, now)] += 1
+        return stats
+    sent = []
+    try:
+        for outbox in messages:
+            try:
+                connection.send_messages([deserialize(outbox.data)])
+            except Exception as error:
+                stats[fail(outbox, error, now)] += 1
+            else:
+                sent.append(outbox.pk)
+    finally:
+        connection.close()
+        OutboxMessage.objects.filter(pk__in=sent).update(
+            status=OutboxMessage.SENT, sent=timezone.now()
+        )
+    if sent:
+        stats['sent'] = len(sent)
+    return stats
+
+
+def purge(now=None):
+    """Удаляет отправленные письма старше OUTBOX_KEEP_SENT секунд."""
+    now = now or timezone.now()
+    deleted, _ = OutboxMessage.objects.filter(
+        status=OutboxMessage.SENT,
+        sent__lt=now - timedelta(seconds=settings.OUTBOX_KEEP_SENT),
+    ).delete()
+    return deleted
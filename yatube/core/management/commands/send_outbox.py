@@ -0,0 +1,55 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import mail
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди пачками, повторяя неудачные '
+        'попытки с растущей паузой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а ждать новых писем',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Пауза между проверками очереди в режиме --loop, секунд',
+        )
+
+    def handle(self, *args, **options):
+        totals = Counter()
+        try:
+            while True:
+                totals.update(self.drain(options['batch_size']))
+                totals['purged'] += mail.purge()
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            'Отправлено: {sent}, отложено: {retried}, '
+            'не отправлено: {failed}, удалено старых: {purged}'.format(
+                **{key: totals[key]
+                   for key in ('sent', 'retried', 'failed', 'purged')}
+            )
+        )
+
+    def drain(self, batch_size):
+        """Пачки подряд, пока в очереди есть письма, которые пора слать."""
+        totals = Counter()
+        while True:
+            stats = mail.deliver(batch_size)
+            totals.update(stats)
+            if sum(stats.values()) < batch_size:
+                return totals
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.middleware.admission import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает, сколько изменяющих запросов пропущено и отклонено '
+        'ограничением частоты и допуском к записи'
+    )
+
+    def handle(self, *args, **options):
+        for name, counts in stats().items():
+            total = sum(
+                count for result, count in counts.items()
+                if result != 'queued'
+            )
+            rejected = counts.get('throttled', 0) + counts.get('shed', 0)
+            ratio = rejected / total if total else 0
+            line = ' '.join(f'{result}={count}'
+                            for result, count in counts.items())
+            self.stdout.write(f'{name}: {line} rejected={ratio:.2%}')
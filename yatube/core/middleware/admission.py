@@ -0,0 +1,122 @@
+"""Допуск изменяющих запросов к базе.
+
+Для страниц из `THROTTLE_RATES` изменяющие запросы ограничены по
+частоте на пользователя или IP; сверх ставки клиент сразу получает 429.
+Изменяющие запросы к страницам из `WRITE_LIMITED_VIEWS` дополнительно
+занимают одно из `WRITE_CONCURRENCY` мест, общих для всех процессов:
+SQLite всё равно пишет по одному, и вместо очереди за блокировкой базы,
+которая тормозит и чтение, лишние запросы после короткого ожидания
+`WRITE_QUEUE_TIMEOUT` получают 503.
+
+Место — ключ в общем кеше, занятый атомарным `cache.add` на
+`WRITE_SLOT_LEASE` секунд. После ответа место освобождается, а место
+процесса, убитого посреди запроса, освободится по истечении срока.
+"""
+import logging
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import throttling
+
+from .query_budget import url_name
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+THROTTLE_RESULTS = ('allowed', 'throttled')
+ADMISSION = 'admission'
+ADMISSION_RESULTS = ('admitted', 'queued', 'shed')
+SLOT_KEY = 'admission:slot:{}'
+# Пауза между попытками занять место во время ожидания.
+POLL_INTERVAL = 0.01
+
+
+def stats():
+    """Счётчики ограничения частоты по страницам и допуска к записи."""
+    result = throttling.stats(
+        list(getattr(settings, 'THROTTLE_RATES', {})), THROTTLE_RESULTS
+    )
+    result.update(throttling.stats([ADMISSION], ADMISSION_RESULTS))
+    return result
+
+
+def acquire(token):
+    """Занимает свободное место и возвращает его ключ или None."""
+    numbers = list(range(settings.WRITE_CONCURRENCY))
+    # Случайный порядок, чтобы процессы не толпились у первых мест.
+    random.shuffle(numbers)
+    for number in numbers:
+        key = SLOT_KEY.format(number)
+        if cache.add(key, token, settings.WRITE_SLOT_LEASE):
+            return key
+    return None
+
+
+def wait_for_slot(token, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(POLL_INTERVAL, remaining))
+        key = acquire(token)
+        if key is not None:
+            return key
+
+
+def release(key, token):
+    # Место могло истечь и достаться другому запросу: его не трогаем.
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+class WriteAdmissionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            slot = getattr(request, '_write_slot', None)
+            if slot is not None:
+                release(*slot)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        name = url_name(request)
+        rate = getattr(settings, 'THROTTLE_RATES', {}).get(name)
+        if rate:
+            allowed, wait = throttling.take(
+                throttling.COUNTER_KEY.format(
+                    name, throttling.client_key(request)
+                ),
+                *throttling.parse_rate(rate),
+            )
+            throttling.record(name, 'allowed' if allowed else 'throttled')
+            if not allowed:
+                logger.warning(
+                    '%s: превышена частота %s для %s',
+                    name, rate, throttling.client_key(request),
+                )
+                return throttling.rejected(429, wait)
+        if (not settings.WRITE_CONCURRENCY
+                or name not in settings.WRITE_LIMITED_VIEWS):
+            return None
+        token = uuid.uuid4().hex
+        key = acquire(token)
+        if key is None:
+            throttling.record(ADMISSION, 'queued')
+            key = wait_for_slot(token, settings.WRITE_QUEUE_TIMEOUT)
+            if key is None:
+                throttling.record(ADMISSION, 'shed')
+                logger.warning('%s: нет свободных мест для записи', name)
+                return throttling.rejected(503, settings.WRITE_RETRY_AFTER)
+        throttling.record(ADMISSION, 'admitted')
+        request._write_slot = (key, token)
+        return None
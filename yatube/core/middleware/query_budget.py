@@ -0,0 +1,142 @@
+"""Учёт SQL-запросов каждого запроса к сайту.
+
+Middleware считает запросы к базе, их суммарное время и повторы
+одинаковых запросов (признак N+1) и пишет это в лог и, если включено
+`QUERY_BUDGET_HEADERS`, в заголовки ответа `X-DB-*`. Для страниц можно
+задать бюджет по имени URL в `QUERY_BUDGETS`; превышение пишется
+в лог с уровнем WARNING.
+
+Тело потокового ответа (выгрузки, `/api/changes/`) читается уже после
+выхода из middleware, поэтому для него учёт продолжается, пока тело
+отдаётся, а запись в лог делается, когда оно отдано или соединение
+закрыто. Заголовки к этому времени уже отправлены, и счётчиков в них
+у потоковых ответов нет.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'IN \((%s, )*%s\)')
+SPACES_RE = re.compile(r'\s+')
+TRANSACTION_RE = re.compile(
+    r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.I
+)
+
+
+def is_transaction_control(sql):
+    """Служебные команды транзакций в бюджет не входят."""
+    return bool(TRANSACTION_RE.match(sql))
+
+
+def fingerprint(sql):
+    """SQL без различий в длине списков IN и пробелах."""
+    return SPACES_RE.sub(' ', IN_LIST_RE.sub('IN (...)', sql)).strip()
+
+
+def get_budget(url_name):
+    default = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name, default)
+
+
+class QueryStats:
+    """Обёртка для `connection.execute_wrapper`, собирающая статистику."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if is_transaction_control(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Повторяющиеся запросы: пары (число выполнений, SQL)."""
+        return sorted(
+            ((count, sql) for sql, count in self.fingerprints.items()
+             if count > 1),
+            reverse=True,
+        )
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def count_queries(stats):
+    """Контекст, в котором запросы ко всем базам попадают в stats."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+def report(request, stats, response=None):
+    """Пишет статистику в лог и, если передан ответ, в его заголовки."""
+    name = url_name(request)
+    budget = get_budget(name)
+    duplicates = sum(count - 1 for count, _ in stats.duplicates)
+    if (response is not None
+            and getattr(settings, 'QUERY_BUDGET_HEADERS', settings.DEBUG)):
+        response['X-DB-Queries'] = str(stats.count)
+        response['X-DB-Time'] = f'{stats.duration * 1000:.2f}'
+        response['X-DB-Duplicates'] = str(duplicates)
+        if budget is not None:
+            response['X-DB-Budget'] = str(budget)
+    over_budget = budget is not None and stats.count > budget
+    logger.log(
+        logging.WARNING if over_budget else logging.DEBUG,
+        '%s %s: %d queries (budget %s), %.2f ms, %d duplicates',
+        request.method, name or request.path, stats.count, budget,
+        stats.duration * 1000, duplicates,
+        extra={
+            'url_name': name,
+            'path': request.path,
+            'queries': stats.count,
+            'db_time_ms': round(stats.duration * 1000, 2),
+            'duplicates': stats.duplicates[:5],
+            'budget': budget,
+        },
+    )
+
+
+def counted_stream(request, stats, content):
+    """Тело потокового ответа, запросы которого учитываются в stats."""
+    try:
+        with count_queries(stats):
+            yield from content
+    finally:
+        report(request, stats)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with count_queries(stats):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = counted_stream(
+                request, stats, response.streaming_content
+            )
+        else:
+            report(request, stats, response)
+        return response
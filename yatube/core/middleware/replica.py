@@ -0,0 +1,52 @@
+"""Выбор базы для чтения на время запроса.
+
+Страницы из `REPLICA_VIEWS` читают из реплик. После успешного
+изменяющего запроса в сессии запоминается момент, до которого
+пользователь читает из основной базы: так он сразу видит свой пост или
+комментарий, даже если реплика ещё не догнала основную базу.
+"""
+import time
+
+from django.conf import settings
+
+from core.routers import set_replica_reads
+
+from .query_budget import url_name
+
+STICKY_KEY = '_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def is_sticky(request):
+    """Не истекло ли окно чтения из основной базы."""
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return False
+    return request.session.get(STICKY_KEY, 0) > time.time()
+
+
+def reads_from_replica(request):
+    return (
+        request.method in SAFE_METHODS
+        and url_name(request) in settings.REPLICA_VIEWS
+        and not is_sticky(request)
+    )
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            set_replica_reads(False)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            request.session[STICKY_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if reads_from_replica(request):
+            set_replica_reads(True)
@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """Письмо в очереди на отправку фоновой командой `send_outbox`."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не отправлено'),
+    )
+
+    status = models.CharField(
+        'Состояние', max_length=8, choices=STATUSES, default=PENDING
+    )
+    subject = models.CharField('Тема', max_length=255, blank=True)
+    recipients = models.TextField('Получатели')
+    # JSON с полями EmailMessage, из которого письмо собирается заново.
+    data = models.TextField('Письмо')
+    created = models.DateTimeField('Создано', default=timezone.now)
+    next_attempt = models.DateTimeField(
+        'Следующая попытка', default=timezone.now
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    claimed_by = models.CharField('Обработчик', max_length=32, blank=True)
+    sent = models.DateTimeField('Отправлено', null=True, blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt'],
+                name='outbox_status_attempt_idx',
+            ),
+        ]
+        verbose_name = 'Письмо'
+        verbose_name_plural = 'Очередь писем'
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
@@ -0,0 +1,69 @@
+"""Маршрутизация запросов между основной базой и репликами.
+
+Запись всегда идёт в `default`. Чтение уходит в реплики, только если
+оно включено для текущего потока: это делает `ReplicaRoutingMiddleware`
+для страниц из `REPLICA_VIEWS`, остальной код читает из основной базы.
+
+Реплики могут отставать, поэтому всё, что кладётся в общий кеш, читается
+из основной базы (`primary_reads`): иначе устаревшие данные остались бы
+в кеше и после того, как реплика догонит основную базу.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def set_replica_reads(enabled):
+    _state.replica = enabled
+
+
+def replicas():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def reading_replica():
+    """Идёт ли сейчас чтение из реплик."""
+    return bool(replicas()) and getattr(_state, 'replica', False)
+
+
+@contextmanager
+def _reads(enabled):
+    previous = getattr(_state, 'replica', False)
+    set_replica_reads(enabled)
+    try:
+        yield
+    finally:
+        set_replica_reads(previous)
+
+
+def replica_reads():
+    """Чтение из реплик в пределах блока."""
+    return _reads(True)
+
+
+def primary_reads():
+    """Чтение из основной базы в пределах блока."""
+    return _reads(False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_replica():
+            return random.choice(replicas())
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них можно связывать.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с данными из основной базы.
+        return db not in replicas()
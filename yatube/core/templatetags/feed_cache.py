@@ -0,0 +1,129 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import reading_replica
+from posts import feed_cache, thumbnails
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, namespace, vary_on):
+        self.nodelist = nodelist
+        self.namespace = namespace
+        self.vary_on = vary_on
+
+    def render(self, context):
+        namespace = self.namespace.resolve(context)
+        if not namespace:
+            return self.nodelist.render(context)
+        key = feed_cache.fragment_key(
+            namespace, [var.resolve(context) for var in self.vary_on]
+        )
+        value = cache.get(key)
+        feed_cache.record(namespace, hit=value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            # Данные страницы прочитаны из реплики, которая может отставать
+            # от версии пространства имён: такой фрагмент не сохраняем.
+            if not reading_replica():
+                cache.set(key, value, settings.FEED_FRAGMENT_TIMEOUT)
+        return value
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """Кеширует фрагмент ленты до смены версии её пространства имён.
+
+    Использование::
+
+        {% feedcache [namespace] [var1] [var2] .. %}
+            ...
+        {% endfeedcache %}
+
+    Фрагмент хранится `FEED_FRAGMENT_TIMEOUT` секунд. Если `namespace`
+    пустое или страница читает из реплик, фрагмент не кешируется.
+    """
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            '%r tag requires at least 1 argument.' % tokens[0]
+        )
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        [parser.compile_filter(bit) for bit in tokens[2:]],
+    )
+
+
+class PostBlocksNode(template.Node):
+    child_nodelists = ('nodelist', 'nodelist_between')
+
+    def __init__(self, nodelist, nodelist_between, posts, namespace):
+        self.nodelist = nodelist
+        self.nodelist_between = nodelist_between
+        self.posts = posts
+        self.namespace = namespace
+
+    def render(self, context):
+        posts = list(self.posts.resolve(context) or [])
+        namespace = self.namespace.resolve(context) or ''
+        keys = [feed_cache.block_key(namespace, post) for post in posts]
+        blocks = cache.get_many(keys)
+        stale = {
+            key: post for key, post in zip(keys, posts) if key not in blocks
+        }
+        if stale:
+            # Миниатюры нужны только блокам, которые отрисовываются заново.
+            thumbnails.prefetch(stale.values())
+        missing = {}
+        for key, post in stale.items():
+            with context.push(post=post):
+                missing[key] = self.nodelist.render(context)
+        if missing:
+            cache.set_many(missing, settings.POST_BLOCK_TIMEOUT)
+            blocks.update(missing)
+            feed_cache.record('block', hit=False, count=len(missing))
+        if len(posts) > len(missing):
+            feed_cache.record(
+                'block', hit=True, count=len(posts) - len(missing)
+            )
+        between = self.nodelist_between.render(context)
+        return between.join(blocks[key] for key in keys)
+
+
+@register.tag('postblocks')
+def do_postblocks(parser, token):
+    """Выводит посты, кешируя блок каждого поста отдельно.
+
+    Использование::
+
+        {% postblocks posts namespace %}
+            ... {{ post }} ...
+        {% between %}
+            ... между постами ...
+        {% endpostblocks %}
+
+    Блоки страницы читаются из кеша одним `get_many`, а отрисовываются
+    только посты, изменившиеся с прошлого раза: для них же одним проходом
+    ищутся миниатюры.
+    """
+    tokens = token.split_contents()
+    if len(tokens) != 3:
+        raise template.TemplateSyntaxError(
+            '%r tag requires exactly 2 arguments.' % tokens[0]
+        )
+    nodelist = parser.parse(('between', 'endpostblocks'))
+    nodelist_between = template.NodeList()
+    if parser.next_token().contents == 'between':
+        nodelist_between = parser.parse(('endpostblocks',))
+        parser.delete_first_token()
+    return PostBlocksNode(
+        nodelist,
+        nodelist_between,
+        parser.compile_filter(tokens[1]),
+        parser.compile_filter(tokens[2]),
+    )
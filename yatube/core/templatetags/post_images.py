@@ -0,0 +1,24 @@
+from django import template
+from django.templatetags.static import static
+
+from posts import thumbnails
+
+register = template.Library()
+
+PLACEHOLDER = 'img/placeholder.png'
+
+
+@register.simple_tag
+def thumbnail_url(image, geometry, **options):
+    """Адрес готовой миниатюры или заглушки.
+
+    Миниатюра в запросе не создаётся: если её ещё нет, картинка уходит
+    в фоновую очередь.
+    """
+    if not image:
+        return ''
+    thumbnail = thumbnails.cached_thumbnail(image, geometry, **options)
+    if thumbnail is None:
+        thumbnails.submit(image.name)
+        return static(PLACEHOLDER)
+    return thumbnail.url
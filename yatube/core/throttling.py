@@ -0,0 +1,101 @@
+"""Ограничение частоты запросов скользящим окном.
+
+Для ставки `N/период` запросы клиента считаются атомарным `cache.incr`
+в счётчиках по окнам длиной в период. Число запросов за последний период
+оценивается как текущий счётчик плюс доля прошлого, пропорциональная
+ещё не истёкшей части периода; сверх N запрос отклоняется. Счётчики
+лежат в общем кеше (`CACHE_LOCATION`), поэтому ставка действует на все
+процессы сразу; без него у каждого процесса свои счётчики.
+
+Счётчики решений хранятся в кеше и показываются командой
+`throttle_stats`.
+"""
+import math
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+COUNTER_KEY = 'throttle:count:{}:{}'
+STATS_KEY = 'throttle:stats:{}:{}'
+
+
+def parse_rate(rate):
+    """'10/m' → (число запросов, период в секундах)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def client_key(request):
+    """Пользователь, а для анонимов — IP-адрес."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def incr(key, timeout):
+    """Атомарно увеличивает счётчик, создавая его при необходимости."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Счётчик вытеснили между add и incr.
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def take(key, limit, period, now=None):
+    """Засчитывает запрос клиента.
+
+    Возвращает (разрешено ли, через сколько секунд повторить запрос).
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = now / period - window
+    current_key = f'{key}:{window}'
+    # Счётчик нужен и в следующем окне, как прошлый.
+    current = incr(current_key, 2 * period)
+    previous = cache.get(f'{key}:{window - 1}', 0)
+    if previous * (1 - elapsed) + current <= limit:
+        return True, 0
+    # Отклонённый запрос не засчитывается.
+    cache.decr(current_key)
+    current -= 1
+    if current < limit:
+        # Хватит дождаться, пока уменьшится вклад прошлого окна.
+        wait = 1 - (limit - current - 1) / previous - elapsed
+    else:
+        # Нужно следующее окно, в котором текущее станет прошлым.
+        wait = 2 - (limit - 1) / current - elapsed
+    return False, wait * period
+
+
+def record(name, result):
+    incr(STATS_KEY.format(name, result), None)
+
+
+def stats(names, results):
+    """Счётчики решений: имя → результат → число."""
+    keys = [STATS_KEY.format(name, result)
+            for name in names for result in results]
+    found = cache.get_many(keys)
+    return {
+        name: {
+            result: found.get(STATS_KEY.format(name, result), 0)
+            for result in results
+        }
+        for name in names
+    }
+
+
+def rejected(status, retry_after):
+    """Быстрый отказ с подсказкой, когда повторить запрос."""
+    response = HttpResponse(
+        'Слишком много запросов, попробуйте позже'
+        if status == 429 else 'Сервер перегружен, попробуйте позже',
+        status=status,
+        content_type='text/plain; charset=utf-8',
+    )
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
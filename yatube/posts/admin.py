@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Group, Post, Comment
+from . import search
+from .models import Comment, Follow, Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +17,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по обратному индексу вместо LIKE по всей таблице."""
+        if not search.query_terms(search_term):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        post_ids = search.ranked_post_ids(search_term, require_all=True)
+        return queryset.filter(pk__in=post_ids.order_by()), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -23,6 +33,7 @@ class GroupAdmin(admin.ModelAdmin):
         'title',
         'slug',
         'description',
+        'posts_count',
     )
 
 
@@ -36,6 +47,17 @@ class CommentAdmin(admin.ModelAdmin):
     )
 
 
+class FollowAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'author',
+        'created',
+    )
+    raw_id_fields = ('user', 'author')
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
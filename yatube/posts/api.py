@@ -0,0 +1,201 @@
+"""JSON API лент только для чтения.
+
+Посты отдаются прямо из строк `values()` без создания моделей, набор
+полей выбирается параметром `fields`, а страницы — курсором, как в
+HTML-лентах с `?cursor=`. Валидаторы ETag и Last-Modified те же, что у
+HTML-страниц, поэтому клиент может дёшево опрашивать ленту условными
+запросами.
+
+Журнал изменений `changes` отдаётся потоком JSONL: по событию на
+строку, начиная с события после `since`.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from . import changes as change_log
+from . import feed_cache
+from .exporting import CONTENT_TYPES
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator
+
+# Поле ответа → выражение для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'author_first_name': 'author__first_name',
+    'author_last_name': 'author__last_name',
+    'group': 'group__slug',
+    'group_title': 'group__title',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'image_size': 'image_size',
+    'comments_count': 'comments_count',
+}
+DEFAULT_POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author', 'group', 'image', 'comments_count',
+)
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+# Хранилище поля, чтобы адреса картинок совпадали с адресами на сайте.
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def selected_fields(request, available, default, param='fields'):
+    """Поля из параметра `param` через запятую или поля по умолчанию."""
+    value = request.GET.get(param)
+    if not value:
+        return list(default)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise FieldsError(
+            'Неизвестные поля: %s. Доступны: %s'
+            % (', '.join(unknown), ', '.join(available))
+        )
+    return fields
+
+
+def serialize(rows, fields, available):
+    """Переименовывает ключи строк values() в поля ответа."""
+    result = []
+    for row in rows:
+        item = {field: row[available[field]] for field in fields}
+        if item.get('image') is not None:
+            item['image'] = (
+                IMAGE_STORAGE.url(item['image']) if item['image'] else None
+            )
+        result.append(item)
+    return result
+
+
+def error(message, status=400):
+    return JsonResponse(
+        {'error': message}, status=status, json_dumps_params=JSON_PARAMS
+    )
+
+
+def page_response(request, queryset, available, default, per_page,
+                  ordering, extra=None, param='fields'):
+    try:
+        fields = selected_fields(request, available, default, param)
+    except FieldsError as exc:
+        return error(str(exc))
+    # Поля ключа сортировки нужны курсору, даже если их не просили.
+    keys = {field.lstrip('-') for field in ordering}
+    lookups = {available[field] for field in fields} | keys
+    paginator = CursorPaginator(
+        queryset.values(*lookups), per_page, ordering=ordering
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    data = dict(extra or {})
+    data.update(
+        results=serialize(page, fields, available),
+        next_cursor=page.next_cursor,
+        previous_cursor=page.previous_cursor,
+    )
+    return JsonResponse(data, json_dumps_params=JSON_PARAMS)
+
+
+def post_page(request, queryset, extra=None):
+    return page_response(
+        request, queryset, POST_FIELDS, DEFAULT_POST_FIELDS,
+        settings.DEFAULT_PAGINATE_BY, ('-pub_date', '-id'), extra,
+    )
+
+
+@require_GET
+@feed_cache.conditional(lambda: feed_cache.GLOBAL)
+def index(request):
+    """Общая лента"""
+    return post_page(request, Post.objects.all())
+
+
+@require_GET
+@feed_cache.conditional(feed_cache.group_namespace_by_slug)
+def group_posts(request, slug):
+    """Лента группы"""
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return post_page(request, Post.objects.filter(group=group))
+
+
+@require_GET
+@feed_cache.conditional(feed_cache.author_namespace_by_username)
+def profile(request, username):
+    """Лента автора"""
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return post_page(request, Post.objects.filter(author=author))
+
+
+@require_GET
+@feed_cache.conditional(feed_cache.post_namespace)
+def post_detail(request, post_id):
+    """Пост и порция его комментариев по курсору"""
+    try:
+        fields = selected_fields(request, POST_FIELDS, DEFAULT_POST_FIELDS)
+    except FieldsError as exc:
+        return error(str(exc))
+    rows = Post.objects.filter(id=post_id).values(
+        *{POST_FIELDS[field] for field in fields}
+    )
+    post = serialize(rows, fields, POST_FIELDS)
+    if not post:
+        return error('Пост не найден', status=404)
+    return page_response(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS, tuple(COMMENT_FIELDS),
+        settings.COMMENTS_PAGINATE_BY, ('created', 'id'),
+        extra={'post': post[0]}, param='comment_fields',
+    )
+
+
+def has_changes_access(request):
+    """Модератор или клиент с токеном из CHANGES_API_TOKEN."""
+    if request.user.is_staff:
+        return True
+    token = settings.CHANGES_API_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+@require_GET
+def changes(request):
+    """События журнала после `since`, не больше `limit` за ответ"""
+    if not has_changes_access(request):
+        return error('Нет доступа к журналу изменений', status=403)
+    try:
+        since = int(request.GET.get('since') or 0)
+        limit = int(request.GET.get('limit') or settings.CHANGES_MAX_LIMIT)
+    except ValueError:
+        return error('since и limit должны быть числами')
+    if since < 0 or limit < 1:
+        return error('since не может быть отрицательным, limit — меньше 1')
+    try:
+        models = selected_fields(
+            request, change_log.SNAPSHOT_FIELDS, (), param='models'
+        )
+    except FieldsError as exc:
+        return error(str(exc))
+    events = change_log.events_after(
+        since, models, min(limit, settings.CHANGES_MAX_LIMIT),
+        settings.CHANGES_BATCH_SIZE,
+    )
+    return StreamingHttpResponse(
+        map(change_log.to_json, events), content_type=CONTENT_TYPES['jsonl']
+    )
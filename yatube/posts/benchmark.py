@@ -0,0 +1,152 @@
+"""Замеры страниц лент на текущих данных.
+
+Каждая страница запрашивается несколько раз тестовым клиентом Django.
+Время меряется на прогонах без трассировки, а число запросов к базе
+и пик памяти — на отдельном прогоне под `tracemalloc`, который сам
+заметно замедляет код.
+"""
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Comment, Group, Post, User
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(int(round(percent / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def default_targets():
+    """Страницы для замера: первые и глубокие страницы самых больших лент.
+
+    Самые большие группа и автор и самый обсуждаемый пост находятся по
+    денормализованным счётчикам.
+    """
+    targets = [
+        ('index', reverse('posts:index')),
+        ('index_deep_page', reverse('posts:index') + '?page=100'),
+        ('index_cursor', reverse('posts:index') + '?cursor='),
+    ]
+    group = Group.objects.order_by('-posts_count').first()
+    if group is not None:
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        targets += [
+            ('group_posts', url),
+            ('group_posts_deep_page', url + '?page=50'),
+        ]
+    author = User.objects.filter(stats__isnull=False).order_by(
+        '-stats__posts_count'
+    ).first()
+    if author is not None:
+        url = reverse('posts:profile', kwargs={'username': author.username})
+        targets += [
+            ('profile', url),
+            ('profile_deep_page', url + '?page=20'),
+        ]
+    post = Post.objects.order_by('-comments_count').first()
+    if post is not None:
+        targets.append((
+            'post_detail',
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+        ))
+    return targets
+
+
+def measure(client, url, repeat, warmup=1, cold=False):
+    """Замеряет одну страницу и возвращает сводку в миллисекундах."""
+    for _ in range(warmup):
+        client.get(url)
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    latency = {
+        f'p{percent}': round(percentile(timings, percent), 3)
+        for percent in PERCENTILES
+    }
+    latency.update(
+        min=round(min(timings), 3),
+        max=round(max(timings), 3),
+        mean=round(sum(timings) / len(timings), 3),
+    )
+    return {
+        'url': url,
+        'status': response.status_code,
+        'latency_ms': latency,
+        'queries': len(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(targets=None, repeat=20, warmup=1, cold=False, username=None):
+    """Замеряет все страницы и возвращает отчёт для сохранения в JSON."""
+    client = Client(SERVER_NAME='localhost')
+    if username:
+        client.force_login(User.objects.get(username=username))
+    if targets is None:
+        targets = default_targets()
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'warmup': warmup,
+            'cold_cache': cold,
+            'user': username,
+            'rows': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+        },
+        'results': {
+            name: measure(client, url, repeat, warmup, cold)
+            for name, url in targets
+        },
+    }
+
+
+def compare(report, baseline):
+    """Изменение p50, запросов и памяти относительно прошлого отчёта."""
+    changes = {}
+    for name, result in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        before = previous['latency_ms']['p50']
+        after = result['latency_ms']['p50']
+        changes[name] = {
+            'p50_ms': (before, after),
+            'p50_change': (after - before) / before if before else None,
+            'queries': (previous['queries'], result['queries']),
+            'peak_memory_kb': (
+                previous['peak_memory_kb'], result['peak_memory_kb']
+            ),
+        }
+    return changes
@@ -0,0 +1,99 @@
+"""Журнал изменений постов, комментариев и групп.
+
+Сигналы моделей и массовые операции (импорт, склейка картинок) пишут
+в `ChangeEvent` событие со снимком полей объекта в той же транзакции,
+что и само изменение. Потребитель запоминает id последнего
+полученного события и в следующий раз просит события после него.
+
+В SQLite записи сериализуются, поэтому события коммитятся в порядке
+своих id и курсор ничего не пропускает. Связанные объекты в снимке
+указаны id, чтобы запись события не требовала запросов к базе. Посты,
+у которых обнуляется `group_id` при удалении группы, получают события
+изменения.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ChangeEvent, Comment, Group, Post
+
+MODEL_NAMES = {Post: 'post', Comment: 'comment', Group: 'group'}
+SNAPSHOT_FIELDS = {
+    'post': (
+        'text', 'author_id', 'group_id', 'pub_date', 'updated_at', 'image',
+        'image_width', 'image_height',
+    ),
+    'comment': ('post_id', 'author_id', 'text', 'created'),
+    'group': ('slug', 'title', 'description'),
+}
+EVENT_FIELDS = ('id', 'model', 'object_id', 'action', 'created', 'data')
+
+
+def snapshot(model, instance):
+    data = {'id': instance.pk}
+    for field in SNAPSHOT_FIELDS[model]:
+        value = getattr(instance, field)
+        if field == 'image':
+            value = value.name or None
+        data[field] = value
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def build(instance, action):
+    model = MODEL_NAMES[type(instance)]
+    return ChangeEvent(
+        model=model,
+        object_id=instance.pk,
+        action=action,
+        data='' if action == ChangeEvent.DELETE else snapshot(
+            model, instance
+        ),
+    )
+
+
+def record(instance, action):
+    build(instance, action).save()
+
+
+def record_many(instances, action):
+    """События для пачки объектов одним INSERT."""
+    events = [build(instance, action) for instance in instances]
+    if events:
+        ChangeEvent.objects.bulk_create(events)
+
+
+def events_after(since, models=None, limit=None, batch_size=1000):
+    """Строки событий с id больше `since` пачками по `batch_size`.
+
+    Каждая пачка — отдельный запрос по первичному ключу, поэтому
+    курсор не держит транзакцию открытой во время отдачи ответа.
+    """
+    events = ChangeEvent.objects.order_by('id')
+    if models:
+        events = events.filter(model__in=models)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size,
+                                                        remaining)
+        rows = list(
+            events.filter(id__gt=since).values_list(*EVENT_FIELDS)[:size]
+        )
+        yield from rows
+        if len(rows) < size:
+            return
+        since = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def to_json(row):
+    """Строка JSONL для события; снимок вставляется как есть."""
+    seq, model, object_id, action, created, data = row
+    head = json.dumps({
+        'seq': seq,
+        'model': model,
+        'id': object_id,
+        'action': action,
+        'at': created.isoformat(),
+    }, ensure_ascii=False)
+    return f'{head[:-1]}, "data": {data or "null"}}}\n'
@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+def _change_stats(user_id, field, delta):
+    """Атомарно меняет счётчик `field` в AuthorStats на delta."""
+    if user_id is None:
+        return
+    queryset = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        queryset.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if queryset.update(**{field: F(field) + delta}):
+        return
+    _, created = AuthorStats.objects.get_or_create(
+        user_id=user_id, defaults={field: delta}
+    )
+    if not created:
+        queryset.update(**{field: F(field) + delta})
+
+
+def change_author_posts(author_id, delta):
+    """Атомарно меняет счётчик постов автора на delta."""
+    _change_stats(author_id, 'posts_count', delta)
+
+
+def change_following(user_id, delta):
+    """Атомарно меняет число подписок пользователя на delta."""
+    _change_stats(user_id, 'following_count', delta)
+
+
+def change_group_posts(group_id, delta):
+    """Атомарно меняет счётчик постов группы на delta."""
+    if group_id is None:
+        return
+    queryset = Group.objects.filter(pk=group_id)
+    if delta < 0:
+        queryset = queryset.filter(posts_count__gte=-delta)
+    queryset.update(posts_count=F('posts_count') + delta)
+
+
+def change_post_comments(post_id, delta):
+    """Атомарно меняет счётчик комментариев поста на delta."""
+    if post_id is None:
+        return
+    queryset = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        queryset = queryset.filter(comments_count__gte=-delta)
+    queryset.update(comments_count=F('comments_count') + delta)
+
+
+# Не больше стольких id в одном IN, чтобы не упереться в лимит SQLite.
+IN_CHUNK_SIZE = 500
+
+
+def _update_by_delta(queryset, lookup, field, deltas):
+    """Один UPDATE на каждое значение прироста вместо UPDATE на строку."""
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            queryset.filter(
+                **{f'{lookup}__in': ids[start:start + IN_CHUNK_SIZE]}
+            ).update(**{field: F(field) + delta})
+
+
+def add_author_posts(deltas):
+    """Увеличивает счётчики постов авторов; `deltas` — id → прирост."""
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk) for pk in deltas if pk is not None],
+        ignore_conflicts=True,
+    )
+    _update_by_delta(
+        AuthorStats.objects.all(), 'user_id', 'posts_count', deltas
+    )
+
+
+def add_group_posts(deltas):
+    _update_by_delta(Group.objects.all(), 'pk', 'posts_count', deltas)
+
+
+def add_post_comments(deltas):
+    _update_by_delta(Post.objects.all(), 'pk', 'comments_count', deltas)
+
+
+def _count_subquery(queryset, field):
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики по данным в таблицах.
+
+    Каждая таблица обновляется одним UPDATE с коррелированным подзапросом.
+    """
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                Q(posts__isnull=False) | Q(follower__isnull=False),
+                stats__isnull=True,
+            ).values_list('pk', flat=True).distinct()
+        ],
+        ignore_conflicts=True,
+    )
+    return {
+        'authors': AuthorStats.objects.update(
+            posts_count=_count_subquery(Post.objects.all(), 'author'),
+            following_count=_count_subquery(Follow.objects.all(), 'user'),
+        ),
+        'groups': Group.objects.update(
+            posts_count=_count_subquery(Post.objects.all(), 'group')
+        ),
+        'posts': Post.objects.update(
+            comments_count=_count_subquery(Comment.objects.all(), 'post')
+        ),
+    }
@@ -0,0 +1,119 @@
+"""Потоковая выгрузка постов автора или группы.
+
+Записи имеют тот же вид, что читает `import_posts`: сначала группы,
+затем посты, а комментарии — сразу после пачки своих постов. Посты
+читаются через `iterator(chunk_size)`, комментарии — одним запросом на
+пачку, поэтому в памяти одновременно находится только одна пачка.
+"""
+import csv
+import json
+
+from .models import Comment, Group
+
+CSV_FIELDS = (
+    'type', 'id', 'slug', 'title', 'description', 'post', 'author', 'group',
+    'text', 'pub_date', 'created', 'image', 'image_url',
+)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def group_record(group):
+    return {
+        'type': 'group',
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }
+
+
+def post_record(post, image_url=None):
+    record = {
+        'type': 'post',
+        'id': post.id,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.name or None,
+    }
+    if image_url is not None:
+        record['image_url'] = image_url(post.image) if post.image else None
+    return record
+
+
+def comment_record(comment):
+    return {
+        'type': 'comment',
+        'post': comment.post_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_records(posts, *, comments=False, image_url=None,
+                   chunk_size=500):
+    """Записи выгрузки для queryset постов.
+
+    `image_url` — функция, которая по файлу картинки возвращает её URL;
+    если она не задана, URL в выгрузку не попадают.
+    """
+    posts = posts.select_related('group', 'author').order_by(
+        'pub_date', 'id'
+    )
+    groups = Group.objects.filter(
+        pk__in=posts.order_by().values('group_id')
+    ).order_by('slug')
+    for group in groups:
+        yield group_record(group)
+    for chunk in _chunks(posts.iterator(chunk_size=chunk_size), chunk_size):
+        for post in chunk:
+            yield post_record(post, image_url)
+        if comments:
+            post_ids = [post.id for post in chunk]
+            chunk_comments = (
+                Comment.objects.filter(post_id__in=post_ids)
+                .select_related('author')
+                .order_by('post_id', 'created', 'id')
+            )
+            for comment in chunk_comments.iterator(chunk_size=chunk_size):
+                yield comment_record(comment)
+
+
+def render_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Буфер для csv.writer, который сразу отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(records):
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_FIELDS, restval='')
+    yield writer.writerow(dict(zip(CSV_FIELDS, CSV_FIELDS)))
+    for record in records:
+        yield writer.writerow(record)
+
+
+RENDERERS = {
+    'jsonl': render_jsonl,
+    'csv': render_csv,
+}
@@ -0,0 +1,263 @@
+"""Версионируемый кеш фрагментов лент.
+
+У каждой ленты есть пространство имён: общая лента, группа или автор.
+Ключ фрагмента включает текущую версию пространства, а сигналы `Post`
+и `Comment` увеличивают версию. Старые фрагменты после этого просто
+перестают читаться и вытесняются по TTL, поэтому TTL может быть долгим,
+но только если кеш общий для всех процессов (`SHARED_CACHE`): иначе
+версию увеличивает лишь процесс, обработавший изменение.
+
+Версия — это время последнего изменения в миллисекундах, поэтому она
+же служит валидатором `Last-Modified` для условных GET-запросов.
+Пространства групп и авторов строятся из id, а id по slug и username из
+URL кешируется, чтобы условный запрос обходился без базы. Так же
+кешируется автор поста: страница поста зависит и от пространства
+автора, где меняются его счётчики.
+
+Имена пользователей и названия групп видны на любых страницах, поэтому
+их смена увеличивает версию общего пространства `NAMES`, которая входит
+в ключ каждого фрагмента и в валидаторы каждой страницы. Переименования
+редки, и сбросить все страницы дешевле, чем искать посты и комментарии
+пользователя или группы.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from core.routers import primary_reads, reading_replica
+
+from .models import Group, Post, User
+
+GLOBAL = 'global'
+NAMES = 'names'
+VERSION_KEY = 'feed_cache:version:{}'
+STATS_KEY = 'feed_cache:stats:{}:{}'
+ID_KEY = 'feed_cache:id:{}:{}'
+
+
+def group_namespace(group_id):
+    return f'group:{group_id}'
+
+
+def author_namespace(author_id):
+    return f'author:{author_id}'
+
+
+def post_namespace(post_id):
+    return f'post:{post_id}'
+
+
+def _lookup(kind, queryset, value, field='pk'):
+    """id объекта по slug или username или None, если его нет."""
+    key = ID_KEY.format(kind, value)
+    pk = cache.get(key)
+    if pk is None:
+        with primary_reads():
+            pk = queryset.values_list(field, flat=True).first()
+        if pk is None:
+            return None
+        cache.set(key, pk, settings.FEED_FRAGMENT_TIMEOUT)
+    return pk
+
+
+def forget(kind, value):
+    """Забывает id для прежнего slug или username или автора поста."""
+    cache.delete(ID_KEY.format(kind, value))
+
+
+def group_namespace_by_slug(slug):
+    pk = _lookup('group', Group.objects.filter(slug=slug), slug)
+    return None if pk is None else group_namespace(pk)
+
+
+def author_namespace_by_username(username):
+    pk = _lookup('author', User.objects.filter(username=username), username)
+    return None if pk is None else author_namespace(pk)
+
+
+def post_namespaces(post_id):
+    """Пространства страницы поста: сам пост и его автор."""
+    author_id = _lookup(
+        'post', Post.objects.filter(pk=post_id), post_id, field='author_id'
+    )
+    if author_id is None:
+        return None
+    return [post_namespace(post_id), author_namespace(author_id)]
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def versions(namespaces):
+    """Текущие версии пространств имён одним чтением из кеша.
+
+    Если ключ вытеснен из кеша, версией становится текущее время: оно
+    больше любой прежней версии, и старые фрагменты не воскреснут.
+    """
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    current = cache.get_many(keys)
+    for key in keys:
+        if key not in current:
+            cache.add(key, _now(), None)
+            current[key] = cache.get(key)
+    return [current[key] for key in keys]
+
+
+def version(namespace):
+    """Текущая версия пространства имён."""
+    return versions([namespace])[0]
+
+
+def page_versions(namespaces):
+    """Версии пространств страницы вместе с версией имён `NAMES`."""
+    return versions([*namespaces, NAMES])
+
+
+def last_modified(version):
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def bump(*namespaces):
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    current = cache.get_many(keys)
+    now = _now()
+    cache.set_many(
+        {key: max(current.get(key, 0) + 1, now) for key in keys}, None
+    )
+
+
+def bump_posts(rows):
+    """Сбрасывает страницы, на которых видны посты.
+
+    `rows` — пары (id поста, id автора, id группы).
+    """
+    rows = list(rows)
+    bump(
+        GLOBAL,
+        *{post_namespace(post_id) for post_id, _, _ in rows},
+        *{author_namespace(author_id) for _, author_id, _ in rows},
+        *{group_namespace(group_id) for _, _, group_id in rows
+          if group_id is not None},
+    )
+
+
+def bump_user(user_id):
+    """Сбрасывает страницы, на которых видно имя пользователя."""
+    bump(author_namespace(user_id), NAMES)
+
+
+def bump_group(group_id):
+    """Сбрасывает страницы, на которых видны название и slug группы."""
+    bump(group_namespace(group_id), NAMES)
+
+
+def fragment_key(namespace, vary_on):
+    vary_on = hashlib.md5(
+        ':'.join(str(value) for value in vary_on).encode()
+    ).hexdigest()
+    current = '.'.join(map(str, page_versions([namespace])))
+    return f'feed_cache:fragment:{namespace}:{current}:{vary_on}'
+
+
+def block_key(namespace, post):
+    """Ключ блока поста в ленте.
+
+    Кроме `updated_at` в ключ входят видимые в блоке поля автора и группы:
+    их изменение не трогает сам пост. Страницы с такими блоками при этом
+    сбрасывает версия `NAMES`, которую увеличивают `bump_user` и
+    `bump_group`.
+    """
+    related = [post.author.username, post.author.get_full_name()]
+    if post.group_id:
+        related.append(post.group.slug)
+    digest = hashlib.md5(':'.join(related).encode()).hexdigest()[:12]
+    stamp = int(post.updated_at.timestamp() * 1000000)
+    return f'feed_cache:block:{namespace}:{post.id}:{stamp}:{digest}'
+
+
+def _kind(namespace):
+    return namespace.split(':', 1)[0]
+
+
+def record(namespace, hit, count=1):
+    key = STATS_KEY.format(_kind(namespace), 'hits' if hit else 'misses')
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        cache.add(key, count, None)
+
+
+def stats():
+    """Счётчики попаданий и промахов по видам лент."""
+    kinds = ('global', 'group', 'author', 'post', 'block')
+    keys = [STATS_KEY.format(kind, result)
+            for kind in kinds for result in ('hits', 'misses')]
+    found = cache.get_many(keys)
+    return {
+        kind: {
+            result: found.get(STATS_KEY.format(kind, result), 0)
+            for result in ('hits', 'misses')
+        }
+        for kind in kinds
+    }
+
+
+def replicated(version):
+    """Дошло ли до реплик изменение, записавшее версию."""
+    max_lag = settings.REPLICA_MAX_LAG
+    return max_lag is not None and version <= _now() - max_lag * 1000
+
+
+def conditional(namespace_func, primary=False):
+    """Условный GET по версии пространства имён страницы.
+
+    `namespace_func` получает аргументы URL и возвращает пространство
+    имён, список пространств или None, если страницы нет. Проверка стоит
+    одно чтение из кеша и выполняется до отрисовки шаблона. Страницы
+    авторизованных пользователей персональны, поэтому валидаторы для них
+    не выдаются.
+    Не выдаются они и без общего кеша, где у каждого процесса своя
+    версия. Страница, прочитанная из реплики, получает валидаторы, только
+    если версия старше `REPLICA_MAX_LAG` секунд и реплика уже получила
+    изменение, которое её записало. `primary=True` говорит, что view
+    строит ответ по основной базе и валидаторы можно выдавать всегда.
+    """
+    def page_version(request, *args, **kwargs):
+        if request.user.is_authenticated or not settings.SHARED_CACHE:
+            return None
+        if not hasattr(request, '_feed_cache_version'):
+            namespaces = namespace_func(*args, **kwargs)
+            if isinstance(namespaces, str):
+                namespaces = [namespaces]
+            current = (
+                None if namespaces is None else page_versions(namespaces)
+            )
+            if (current is not None and not primary and reading_replica()
+                    and not replicated(max(current))):
+                current = None
+            request._feed_cache_version = current
+        return request._feed_cache_version
+
+    def etag_func(request, *args, **kwargs):
+        current = page_version(request, *args, **kwargs)
+        if current is None:
+            return None
+        query = hashlib.md5(
+            request.META.get('QUERY_STRING', '').encode()
+        ).hexdigest()[:8]
+        return '-'.join(map(str, current)) + f'-{query}'
+
+    def last_modified_func(request, *args, **kwargs):
+        current = page_version(request, *args, **kwargs)
+        if current is None:
+            return None
+        return last_modified(max(current))
+
+    return condition(
+        etag_func=etag_func, last_modified_func=last_modified_func
+    )
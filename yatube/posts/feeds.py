@@ -0,0 +1,157 @@
+"""RSS и Atom для общей ленты, групп и авторов.
+
+Готовый XML хранится в кеше под ключом с версией пространства имён
+ленты из `feed_cache`, поэтому сигналы, сбрасывающие HTML-страницы,
+сбрасывают и документ ленты. Условные запросы проверяются по той же
+версии до обращения к базе, так что агрегатор, опрашивающий
+неизменившуюся ленту, получает 304 по одному чтению из кеша.
+Документ, который попадёт в кеш, строится по основной базе, даже если
+страница читает из реплик.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from core.routers import primary_reads
+
+from . import feed_cache
+from .models import Group, Post, User
+
+XML_KEY = 'feed_cache:xml:{}:{}:{}:{}:{}'
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def get_posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.get_posts(obj).select_related('author', 'group')[
+            :settings.FEED_SIZE
+        ]
+
+    def item_title(self, item):
+        return item.text[:50]
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.id})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', kwargs={'slug': obj.slug})
+
+    def get_posts(self, obj):
+        return obj.posts.all()
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Записи автора {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def get_posts(self, obj):
+        return obj.posts.all()
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class LatestPostsAtomFeed(AtomMixin, LatestPostsFeed):
+    pass
+
+
+class GroupPostsAtomFeed(AtomMixin, GroupPostsFeed):
+    pass
+
+
+class AuthorPostsAtomFeed(AtomMixin, AuthorPostsFeed):
+    pass
+
+
+def cached_feed(feed, namespace_func):
+    """View ленты с XML в кеше до смены версии пространства имён."""
+    @feed_cache.conditional(namespace_func, primary=True)
+    def view(request, *args, **kwargs):
+        namespace = namespace_func(*args, **kwargs)
+        if namespace is None:
+            # Группы или автора нет: Feed ответит 404.
+            return feed(request, *args, **kwargs)
+        version = '.'.join(map(str, feed_cache.page_versions([namespace])))
+        # Ссылки в XML абсолютные, поэтому документ зависит от адреса сайта.
+        key = XML_KEY.format(
+            namespace, version, type(feed).__name__,
+            request.scheme, request.get_host(),
+        )
+        cached = cache.get(key)
+        feed_cache.record(namespace, hit=cached is not None)
+        if cached is None:
+            with primary_reads():
+                response = feed(request, *args, **kwargs)
+            cached = (response.content, response['Content-Type'])
+            cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    return view
+
+
+def global_namespace():
+    return feed_cache.GLOBAL
+
+
+index_rss = cached_feed(LatestPostsFeed(), global_namespace)
+index_atom = cached_feed(LatestPostsAtomFeed(), global_namespace)
+group_rss = cached_feed(
+    GroupPostsFeed(), feed_cache.group_namespace_by_slug
+)
+group_atom = cached_feed(
+    GroupPostsAtomFeed(), feed_cache.group_namespace_by_slug
+)
+profile_rss = cached_feed(
+    AuthorPostsFeed(), feed_cache.author_namespace_by_username
+)
+profile_atom = cached_feed(
+    AuthorPostsAtomFeed(), feed_cache.author_namespace_by_username
+)
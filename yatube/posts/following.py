@@ -0,0 +1,183 @@
+"""Лента подписок.
+
+Пока пользователь подписан не больше чем на `FOLLOW_MERGE_MAX_AUTHORS`
+авторов, его лента собирается слиянием (`heapq.merge`) окон последних
+постов этих авторов из `timelines`. Окна общие для всех читателей и
+читаются одним `get_many`, а недостающие загружаются одним запросом с
+`ROW_NUMBER()`.
+
+Тем, кто подписан на большее число авторов, слияние обходится дороже
+готового списка, поэтому их лента хранится отдельным окном
+`timelines.follow_key`, которое сигналы постов пополняют при публикации.
+
+Страница собирается из окон, только если они точно её покрывают; иначе,
+как и для курсоров «назад», она читается из базы `CursorPaginator`.
+Курсоры у обоих путей одинаковые.
+"""
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.dateparse import parse_datetime
+
+from core.routers import primary_reads
+
+from . import timelines
+from .models import AuthorStats, Follow, Post
+from .paginators import (CursorPage, CursorPaginator, decode_cursor,
+                         encode_cursor)
+
+
+def is_heavy(following_count):
+    return following_count > settings.FOLLOW_MERGE_MAX_AUTHORS
+
+
+def fanout_keys(author_ids):
+    """Готовые ленты подписчиков, в которые попадают посты авторов."""
+    user_ids = Follow.objects.filter(
+        author_id__in=author_ids,
+        user__stats__following_count__gt=settings.FOLLOW_MERGE_MAX_AUTHORS,
+    ).values_list('user_id', flat=True).distinct()
+    return [timelines.follow_key(user_id) for user_id in user_ids]
+
+
+def followed_posts(user):
+    return Post.objects.filter(author__following__user=user)
+
+
+def recent_posts(author_ids):
+    """Последние `TIMELINE_SIZE` постов каждого автора одним запросом."""
+    ranked = Post.objects.filter(author_id__in=author_ids).annotate(
+        place=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )
+    ).order_by().values('id', 'author_id', 'pub_date', 'place')
+    sql, params = ranked.query.sql_with_params()
+    return Post.objects.raw(
+        f'SELECT id, author_id, pub_date FROM ({sql}) '
+        f'WHERE place <= %s ORDER BY place',
+        (*params, settings.TIMELINE_SIZE),
+    )
+
+
+def author_windows(author_ids):
+    keys = {
+        timelines.author_key(author_id): author_id
+        for author_id in author_ids
+    }
+    windows = cache.get_many(list(keys))
+    missing = [
+        author_id for key, author_id in keys.items() if key not in windows
+    ]
+    if missing:
+        rows = defaultdict(list)
+        with primary_reads():
+            for post in recent_posts(missing):
+                rows[post.author_id].append((post.pub_date, post.id))
+        loaded = {
+            timelines.author_key(author_id): timelines.build(rows[author_id])
+            for author_id in missing
+        }
+        cache.set_many(loaded, settings.TIMELINE_TIMEOUT)
+        windows.update(loaded)
+    return list(windows.values())
+
+
+def user_windows(user):
+    """Окна, из которых складывается лента пользователя."""
+    following_count = AuthorStats.objects.filter(user=user).values_list(
+        'following_count', flat=True
+    ).first() or 0
+    if is_heavy(following_count):
+        key = timelines.follow_key(user.id)
+        return [timelines.get(key, followed_posts(user))]
+    return author_windows(
+        Follow.objects.filter(user=user).values_list('author_id', flat=True)
+    )
+
+
+def merge_entries(windows, after, size):
+    """Первые `size` + 1 записей после `after` из слияния окон.
+
+    Возвращает None, если за концом неполного окна могут оказаться
+    посты, которые попали бы на страницу.
+    """
+    streams = []
+    for window in windows:
+        entries = window['entries']
+        start = bisect_right(entries, after) if after is not None else 0
+        streams.append(islice(entries, start, None))
+    merged = list(islice(heapq.merge(*streams), size + 1))
+    for window in windows:
+        if window['complete']:
+            continue
+        if len(merged) <= size or window['entries'][-1] < merged[-1]:
+            return None
+    return merged
+
+
+def cursor_entry(values):
+    try:
+        pub_date, post_id = values
+        return timelines.entry(parse_datetime(pub_date), int(post_id))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def hydrate(paginator, entries, is_first, cursor):
+    """Страница из записей окна или None, если кеш разошёлся с базой."""
+    window = entries[:paginator.per_page]
+    found = paginator.object_list.in_bulk(
+        [-post_id for _, post_id in window]
+    )
+    posts = []
+    for timestamp, post_id in window:
+        post = found.get(-post_id)
+        if post is None or post.pub_date.timestamp() != -timestamp:
+            return None
+        posts.append(post)
+    if not posts:
+        return CursorPage(
+            posts, paginator, is_first=is_first, cursor=cursor
+        )
+    has_more = len(entries) > paginator.per_page
+    return CursorPage(
+        posts, paginator,
+        next_cursor=encode_cursor([posts[-1].pub_date, posts[-1].id])
+        if has_more else None,
+        previous_cursor=None if is_first else encode_cursor(
+            [posts[0].pub_date, posts[0].id], reverse=True
+        ),
+        is_first=is_first,
+        cursor=cursor,
+    )
+
+
+def get_page(user, cursor, per_page):
+    """Страница ленты подписок вместе с авторами и группами постов."""
+    paginator = CursorPaginator(
+        followed_posts(user).select_related('group', 'author'), per_page
+    )
+    decoded = decode_cursor(cursor)
+    after = None
+    if decoded is not None:
+        values, reverse = decoded
+        after = cursor_entry(values)
+        if reverse or after is None:
+            return paginator.get_page(cursor)
+    entries = merge_entries(user_windows(user), after, per_page)
+    page = None
+    if entries is not None:
+        page = hydrate(
+            paginator, entries, is_first=decoded is None, cursor=cursor
+        )
+    if page is None:
+        page = paginator.get_page(cursor)
+    return page
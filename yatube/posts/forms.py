@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
@@ -16,6 +18,28 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def clean_image(self):
+        """Уменьшает новую картинку и убирает из неё метаданные.
+
+        Анимированная картинка сохраняется как есть, вместе с
+        метаданными: перекодирование потеряло бы анимацию.
+        """
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        normalized = images.normalize(image)
+        self.instance.image_width = normalized.width
+        self.instance.image_height = normalized.height
+        self.instance.image_size = normalized.size
+        return normalized.file
+
+    def _post_clean(self):
+        super()._post_clean()
+        if not self.instance.image:
+            self.instance.image_width = None
+            self.instance.image_height = None
+            self.instance.image_size = None
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,96 @@
+"""Нормализация картинок постов при загрузке.
+
+Django сохраняет большую загрузку во временный файл, а Pillow при
+открытии читает только заголовок, поэтому размеры проверяются до
+декодирования. JPEG декодируется сразу в уменьшенном масштабе через
+`draft()`, затем картинка уменьшается до `IMAGE_MAX_SIDE`, поворачивается
+по EXIF и перекодируется без метаданных в `IMAGE_FORMAT`.
+
+Анимированные картинки не перекодируются, чтобы не потерять анимацию:
+для них только проверяются размеры.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+class NormalizedImage:
+    def __init__(self, file, width, height):
+        self.file = file
+        self.width = width
+        self.height = height
+
+    @property
+    def size(self):
+        return self.file.size
+
+
+def check_header(image, size):
+    """Проверяет размер файла и число пикселей по заголовку."""
+    if size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ',
+            code='file_too_large',
+            params={'limit': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+        )
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)d×%(height)d слишком большая',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+
+
+def encode(image, max_side):
+    """Уменьшает открытую картинку и кодирует её без метаданных."""
+    # draft() уменьшает JPEG кратно 1/2..1/8 ещё при декодировании.
+    image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    image_format = settings.IMAGE_FORMAT
+    transparent = (
+        'A' in image.getbands() or 'transparency' in image.info
+    )
+    if image_format == 'JPEG' or not transparent:
+        image = image.convert('RGB')
+    elif image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    # Новая картинка не несёт EXIF, ICC и прочие блоки исходника.
+    image.save(
+        buffer, format=image_format, quality=settings.IMAGE_QUALITY,
+        optimize=True,
+    )
+    return buffer.getvalue(), image.size
+
+
+def normalize(upload):
+    """Проверяет загруженную картинку и возвращает NormalizedImage."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является картинкой', code='invalid')
+    with image:
+        check_header(image, upload.size)
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return NormalizedImage(upload, *image.size)
+        try:
+            content, (width, height) = encode(image, settings.IMAGE_MAX_SIDE)
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(
+                'Картинку не удалось прочитать', code='invalid'
+            )
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    extension = EXTENSIONS[settings.IMAGE_FORMAT]
+    return NormalizedImage(
+        ContentFile(content, name=f'{stem}.{extension}'), width, height
+    )
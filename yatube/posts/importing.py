@@ -0,0 +1,347 @@
+"""Потоковый импорт групп, постов и комментариев из старой системы.
+
+Вход — JSONL или CSV, по записи на строку; поле `type` задаёт вид
+записи: `group`, `post` или `comment`. Файл читается потоково, записи
+копятся в пачку и сохраняются через `bulk_create` в одной транзакции
+вместе с позицией в файле, поэтому после сбоя импорт продолжается с
+первой несохранённой записи.
+
+Авторы и группы ищутся по словарям в памяти, недостающие создаются
+пачкой. Сигналы при `bulk_create` не срабатывают, поэтому счётчики,
+поисковый индекс, кеш лент и журнал изменений обновляются здесь же
+после каждой пачки.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import changes, counters, feed_cache, following, search, timelines
+from .models import (ChangeEvent, Comment, Group, ImportCheckpoint,
+                     ImportedPost, Post, SearchToken, User)
+from .seeding import explicit_dates
+from .storage import post_images
+
+RECORD_TYPES = ('group', 'post', 'comment')
+
+
+class RecordError(Exception):
+    """Ошибка в записи входного файла."""
+
+    def __init__(self, position, message):
+        super().__init__(f'Запись {position}: {message}')
+        self.position = position
+
+
+def read_records(path, file_format=None, record_type=None):
+    """Записи файла по одной, формат определяется по расширению."""
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            records = csv.DictReader(file)
+        else:
+            records = (json.loads(line) for line in file if line.strip())
+        for record in records:
+            if record_type:
+                record.setdefault('type', record_type)
+            yield record
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def assign_pks(model, objects, last_id):
+    """Проставляет id объектам после `bulk_create`.
+
+    SQLite не возвращает id из `bulk_create`, а внутри транзакции новые
+    строки получают id подряд после `last_id`.
+    """
+    if not objects or objects[0].pk is not None:
+        return
+    new_ids = model.objects.filter(pk__gt=last_id).order_by(
+        'pk'
+    ).values_list('pk', flat=True)
+    for obj, pk in zip(objects, new_ids):
+        obj.pk = pk
+
+
+def parse_date(value, default):
+    if not value:
+        return default
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Importer:
+    def __init__(self, source, *, batch_size=1000, media_from=None,
+                 skip_invalid=False, log=None):
+        self.source = source
+        self.batch_size = batch_size
+        self.media_from = media_from
+        self.skip_invalid = skip_invalid
+        self.log = log or (lambda message: None)
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.posts = dict(
+            ImportedPost.objects.filter(source=source).values_list(
+                'legacy_id', 'post_id'
+            )
+        )
+        self.stats = Counter()
+
+    @property
+    def checkpoint(self):
+        return ImportCheckpoint.objects.get_or_create(source=self.source)[0]
+
+    def run(self, records):
+        """Импортирует записи и возвращает счётчики по видам."""
+        position = self.checkpoint.position
+        if position:
+            self.log(f'Продолжение с записи {position}')
+        self.started = time.monotonic()
+        batch = []
+        for number, record in enumerate(records):
+            if number < position:
+                continue
+            batch.append((number + 1, record))
+            if len(batch) >= self.batch_size:
+                self.save_batch(batch)
+                batch = []
+        if batch:
+            self.save_batch(batch)
+        return self.stats
+
+    def save_batch(self, batch):
+        by_type = {record_type: [] for record_type in RECORD_TYPES}
+        for position, record in batch:
+            record_type = record.get('type')
+            if record_type not in by_type:
+                self.invalid(position, f'неизвестный тип {record_type!r}')
+                continue
+            by_type[record_type].append((position, record))
+        with transaction.atomic():
+            self.save_groups(by_type['group'])
+            self.save_posts(by_type['post'])
+            self.save_comments(by_type['comment'])
+            ImportCheckpoint.objects.filter(source=self.source).update(
+                position=batch[-1][0]
+            )
+        self.stats['records'] += len(batch)
+        self.log(
+            f'Обработано записей: {batch[-1][0]}, '
+            f'{self.rate():.0f} записей/с'
+        )
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.stats['records'] / elapsed if elapsed else 0
+
+    def invalid(self, position, message):
+        if not self.skip_invalid:
+            raise RecordError(position, message)
+        self.stats['skipped'] += 1
+        self.log(f'Пропущена запись {position}: {message}')
+
+    def resolve_users(self, usernames):
+        missing = {name for name in usernames if name not in self.users}
+        if not missing:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=password) for name in missing],
+            ignore_conflicts=True,
+        )
+        self.users.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'pk'
+            )
+        )
+        self.stats['users'] += len(missing)
+
+    def resolve_groups(self, groups):
+        """Создаёт группы, которых ещё нет; `groups` — slug → поля."""
+        missing = {
+            slug: fields for slug, fields in groups.items()
+            if slug not in self.groups
+        }
+        if not missing:
+            return
+        groups = [
+            Group(
+                slug=slug,
+                title=(fields.get('title') or slug)[:200],
+                description=fields.get('description') or '',
+            )
+            for slug, fields in missing.items()
+        ]
+        Group.objects.bulk_create(groups, ignore_conflicts=True)
+        self.groups.update(
+            Group.objects.filter(slug__in=missing).values_list('slug', 'pk')
+        )
+        for group in groups:
+            group.pk = self.groups[group.slug]
+        changes.record_many(groups, ChangeEvent.CREATE)
+        self.stats['groups'] += len(missing)
+
+    def save_groups(self, records):
+        groups = {}
+        for position, record in records:
+            if not record.get('slug'):
+                self.invalid(position, 'у группы нет slug')
+                continue
+            groups[record['slug']] = record
+        self.resolve_groups(groups)
+
+    def copy_image(self, name):
+        """Копирует картинку в хранилище постов и возвращает новое имя."""
+        path = os.path.join(self.media_from or '', name)
+        with open(path, 'rb') as file:
+            return post_images.save(
+                f'posts/{os.path.basename(name)}', File(file)
+            )
+
+    def valid_posts(self, records):
+        """Записи постов без ошибок и без уже импортированных id."""
+        now = timezone.now()
+        valid = []
+        seen = set()
+        for position, record in records:
+            legacy_id = record.get('id')
+            if legacy_id not in (None, ''):
+                legacy_id = str(legacy_id)
+                if legacy_id in self.posts or legacy_id in seen:
+                    # Пост уже импортирован, например до --restart.
+                    self.stats['existing'] += 1
+                    continue
+                seen.add(legacy_id)
+            if not record.get('author') or not record.get('text'):
+                self.invalid(position, 'у поста нет автора или текста')
+                continue
+            try:
+                pub_date = parse_date(record.get('pub_date'), now)
+            except ValueError as error:
+                self.invalid(position, str(error))
+                continue
+            valid.append((position, record, pub_date))
+        return valid
+
+    def build_post(self, position, record, pub_date):
+        image = record.get('image') or ''
+        if image:
+            try:
+                image = self.copy_image(image)
+            except OSError as error:
+                self.invalid(position, f'нет картинки: {error}')
+                image = ''
+        return Post(
+            text=record['text'],
+            author_id=self.users[record['author']],
+            group_id=self.groups.get(record.get('group') or None),
+            image=image,
+            pub_date=pub_date,
+        )
+
+    def save_posts(self, records):
+        valid = self.valid_posts(records)
+        if not valid:
+            return
+        self.resolve_users(record['author'] for _, record, _ in valid)
+        self.resolve_groups({
+            record['group']: {} for _, record, _ in valid
+            if record.get('group')
+        })
+        posts = [self.build_post(*row) for row in valid]
+        legacy_ids = [record.get('id') for _, record, _ in valid]
+        last_id = last_pk(Post)
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            Post.objects.bulk_create(posts)
+        assign_pks(Post, posts, last_id)
+        ImportedPost.objects.bulk_create([
+            ImportedPost(source=self.source, legacy_id=str(legacy_id),
+                         post_id=post.pk)
+            for post, legacy_id in zip(posts, legacy_ids)
+            if legacy_id not in (None, '')
+        ])
+        self.posts.update(
+            (str(legacy_id), post.pk)
+            for post, legacy_id in zip(posts, legacy_ids)
+            if legacy_id not in (None, '')
+        )
+        SearchToken.objects.bulk_create([
+            token for post in posts
+            for token in search.build_tokens(post.pk, post.text)
+        ])
+        self.update_feeds(posts, [record for _, record, _ in valid])
+        changes.record_many(posts, ChangeEvent.CREATE)
+        self.stats['posts'] += len(posts)
+
+    def update_feeds(self, posts, records):
+        """Счётчики, ленты и версии кеша для новой пачки постов."""
+        authors = Counter(post.author_id for post in posts)
+        groups = Counter(post.group_id for post in posts if post.group_id)
+        counters.add_author_posts(authors)
+        counters.add_group_posts(groups)
+        keys = {timelines.GLOBAL_KEY}
+        keys.update(timelines.author_key(author_id) for author_id in authors)
+        keys.update(timelines.group_key(group_id) for group_id in groups)
+        keys.update(following.fanout_keys(list(authors)))
+        transaction.on_commit(lambda: timelines.reset(keys))
+        namespaces = {feed_cache.GLOBAL}
+        namespaces.update(map(feed_cache.author_namespace, authors))
+        namespaces.update(map(feed_cache.group_namespace, groups))
+        transaction.on_commit(lambda: feed_cache.bump(*namespaces))
+
+    def save_comments(self, records):
+        now = timezone.now()
+        valid = []
+        for position, record in records:
+            post_id = self.posts.get(str(record.get('post')))
+            if post_id is None:
+                self.invalid(position, f'нет поста {record.get("post")!r}')
+                continue
+            if not record.get('author') or not record.get('text'):
+                self.invalid(position, 'у комментария нет автора или текста')
+                continue
+            try:
+                created = parse_date(record.get('created'), now)
+            except ValueError as error:
+                self.invalid(position, str(error))
+                continue
+            valid.append((record, post_id, created))
+        if not valid:
+            return
+        self.resolve_users(record['author'] for record, _, _ in valid)
+        comments = [
+            Comment(
+                post_id=post_id,
+                author_id=self.users[record['author']],
+                text=record['text'],
+                created=created,
+            )
+            for record, post_id, created in valid
+        ]
+        last_id = last_pk(Comment)
+        with explicit_dates(Comment._meta.get_field('created')):
+            Comment.objects.bulk_create(comments)
+        assign_pks(Comment, comments, last_id)
+        changes.record_many(comments, ChangeEvent.CREATE)
+        per_post = Counter(comment.post_id for comment in comments)
+        counters.add_post_comments(per_post)
+        namespaces = [feed_cache.post_namespace(pk) for pk in per_post]
+        transaction.on_commit(lambda: feed_cache.bump(*namespaces))
+        self.stats['comments'] += len(comments)
@@ -0,0 +1,181 @@
+"""Пропускная способность смешанной нагрузки несколькими процессами.
+
+Каждый процесс-воркер в цикле открывает общую ленту анонимно и с долей
+`write_ratio` публикует пост от имени тестового автора. Прогон идёт на
+копии текущей базы, поэтому данные сайта не меняются, а все прогоны
+начинаются с одинаковых данных. Воркеры запускаются через `spawn` и
+стартуют одновременно по барьеру, так что время импорта Django в замер
+не попадает.
+
+Модуль импортируется в воркере до `django.setup()`, поэтому модели
+и всё, что их импортирует, загружаются внутри функций.
+"""
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from contextlib import closing
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+USERNAME = 'load_benchmark'
+# Сколько ждать воркер сверх длительности прогона: запуск Django и т. п.
+STARTUP_TIMEOUT = 120
+
+
+def copy_database(path):
+    """Копирует основную базу SQLite в файл `path`."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    with closing(sqlite3.connect(path)) as target:
+        primary.connection.backup(target)
+
+
+def worker(task, barrier, results):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+    from django.test import Client
+    from django.urls import reverse
+
+    from .models import User
+
+    profile = settings.SQLITE_PROFILES[task['profile']]
+    settings.DB_PROFILE = task['profile']
+    settings.REPLICA_DATABASES = []
+    database = connections[DEFAULT_DB_ALIAS].settings_dict
+    database['NAME'] = task['path']
+    database['CONN_MAX_AGE'] = profile['conn_max_age']
+    rng = random.Random(task['seed'])
+    reader = Client(SERVER_NAME='localhost')
+    writer = Client(SERVER_NAME='localhost')
+    writer.force_login(User.objects.get(username=USERNAME))
+    index, create = reverse('posts:index'), reverse('posts:post_create')
+    latencies = {'read': [], 'write': []}
+    errors = Counter()
+    barrier.wait()
+    deadline = time.perf_counter() + task['duration']
+    while time.perf_counter() < deadline:
+        kind = 'write' if rng.random() < task['write_ratio'] else 'read'
+        started = time.perf_counter()
+        try:
+            if kind == 'write':
+                response = writer.post(
+                    create, {'text': f'Нагрузочный пост {rng.random()}'}
+                )
+            else:
+                response = reader.get(index)
+        except OperationalError as error:
+            errors[str(error)] += 1
+            continue
+        if response.status_code >= 400:
+            errors[f'HTTP {response.status_code}'] += 1
+            continue
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    results.put({'latencies': latencies, 'errors': dict(errors)})
+
+
+def summarize(results, duration):
+    from .benchmark import percentile
+
+    latencies = {'read': [], 'write': []}
+    errors = Counter()
+    for result in results:
+        for kind, values in result['latencies'].items():
+            latencies[kind] += values
+        errors.update(result['errors'])
+    summary = {
+        'requests_per_s': round(
+            sum(len(values) for values in latencies.values()) / duration, 1
+        ),
+        'errors': sum(errors.values()),
+        'error_messages': dict(errors.most_common(3)),
+    }
+    for kind, values in latencies.items():
+        summary[f'{kind}s_per_s'] = round(len(values) / duration, 1)
+        for percent in (50, 99):
+            value = percentile(values, percent)
+            summary[f'{kind}_p{percent}_ms'] = (
+                round(value, 2) if value is not None else None
+            )
+    return summary
+
+
+def run_once(source, profile, workers, duration, write_ratio, seed):
+    """Один прогон на свежей копии базы `source`."""
+    directory = tempfile.mkdtemp(prefix='yatube-load-')
+    try:
+        path = os.path.join(directory, 'db.sqlite3')
+        shutil.copyfile(source, path)
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(workers)
+        channel = context.Queue()
+        processes = [
+            context.Process(target=worker, args=({
+                'profile': profile,
+                'path': path,
+                'duration': duration,
+                'write_ratio': write_ratio,
+                'seed': seed + number,
+            }, barrier, channel))
+            for number in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            results = [
+                channel.get(timeout=duration + STARTUP_TIMEOUT)
+                for _ in processes
+            ]
+        except queue.Empty:
+            for process in processes:
+                process.terminate()
+            raise RuntimeError('Воркер завершился, не вернув результат')
+        finally:
+            for process in processes:
+                process.join()
+        return summarize(results, duration)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(profiles, workers, duration=5.0, write_ratio=0.1, seed=0):
+    """Прогоны для всех сочетаний профиля и числа воркеров."""
+    from .models import User
+
+    if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+        raise ValueError('Замер рассчитан на SQLite')
+    directory = tempfile.mkdtemp(prefix='yatube-load-')
+    try:
+        source = os.path.join(directory, 'source.sqlite3')
+        copy_database(source)
+        with closing(sqlite3.connect(source)) as copy:
+            # Автор для записи создаётся только в копии.
+            user = User(username=USERNAME)
+            user.set_unusable_password()
+            copy.execute(
+                'INSERT OR IGNORE INTO auth_user (username, password, '
+                'first_name, last_name, email, is_superuser, is_staff, '
+                "is_active, date_joined) VALUES (?, ?, '', '', '', 0, 0, 1, "
+                "datetime('now'))",
+                (user.username, user.password),
+            )
+            copy.commit()
+        return [
+            dict(
+                profile=profile, workers=count,
+                **run_once(source, profile, count, duration, write_ratio,
+                           seed),
+            )
+            for profile in profiles
+            for count in workers
+        ]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
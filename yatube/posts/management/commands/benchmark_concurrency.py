@@ -0,0 +1,73 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import load_benchmark
+
+COLUMNS = (
+    ('profile', 'профиль'),
+    ('workers', 'воркеры'),
+    ('requests_per_s', 'запр/с'),
+    ('reads_per_s', 'чтение/с'),
+    ('writes_per_s', 'запись/с'),
+    ('read_p99_ms', 'чтение p99'),
+    ('write_p99_ms', 'запись p99'),
+    ('errors', 'ошибки'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность общей ленты и создания поста '
+        'под нагрузкой нескольких процессов для профилей SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+        )
+        parser.add_argument(
+            '--profiles', nargs='+', default=['default', 'production'],
+            help='Профили из SQLITE_PROFILES',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Длительность одного прогона в секундах',
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help='Доля запросов на создание поста',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default=None, help='Файл для отчёта в JSON',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['profiles']) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(
+                'Неизвестные профили: %s' % ', '.join(sorted(unknown))
+            )
+        if min(options['workers']) < 1:
+            raise CommandError('--workers должен быть больше 0')
+        try:
+            results = load_benchmark.run(
+                options['profiles'], options['workers'],
+                duration=options['duration'],
+                write_ratio=options['write_ratio'],
+                seed=options['seed'],
+            )
+        except (RuntimeError, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write(
+            '  '.join(f'{title:>11}' for _, title in COLUMNS)
+        )
+        for result in results:
+            self.stdout.write('  '.join(
+                f'{str(result[key]):>11}' for key, _ in COLUMNS
+            ))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
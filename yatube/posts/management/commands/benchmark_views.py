@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов и пик памяти страниц лент '
+        'и поста на текущих данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз запрашивать каждую страницу',
+        )
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--user', default=None,
+            help='Запрашивать страницы от имени этого пользователя',
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для отчёта в JSON, по умолчанию — stdout',
+        )
+        parser.add_argument(
+            '--baseline', default=None,
+            help='Прошлый отчёт для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        report = benchmark.run(
+            repeat=options['repeat'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            username=options['user'],
+        )
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(data)
+        else:
+            self.stdout.write(data)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            changes = benchmark.compare(report, baseline)
+            for name, change in changes.items():
+                before, after = change['p50_ms']
+                ratio = change['p50_change']
+                self.stdout.write(
+                    f'{name}: p50 {before} -> {after} мс'
+                    + (f' ({ratio:+.1%})' if ratio is not None else '')
+                    + ', запросов {} -> {}'.format(*change['queries'])
+                    + ', память {} -> {} КБ'.format(*change['peak_memory_kb'])
+                )
@@ -0,0 +1,102 @@
+import posixpath
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import changes, feed_cache, media
+from posts.models import ChangeEvent, Post
+from posts.storage import content_name, is_content_name, post_images
+
+POSTS_DIR = 'posts'
+
+
+def walk(storage, directory):
+    """Все файлы каталога хранилища с подкаталогами."""
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = (
+        'Переименовывает картинки постов по содержимому, склеивая '
+        'одинаковые файлы, и переводит посты на новые имена'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить файлы, на которые не ссылается ни один пост',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет сделано',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        names = (
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        stats = {'moved': 0, 'merged': 0, 'missing': 0, 'freed': 0}
+        seen = set()
+        # Список целиком: имена меняются по ходу обхода.
+        for name in list(names):
+            if is_content_name(name):
+                continue
+            if not post_images.exists(name):
+                stats['missing'] += 1
+                self.stderr.write(f'Нет файла {name}')
+                continue
+            self.dedupe(name, stats, seen, dry_run)
+        if options['prune']:
+            stats['pruned'] = self.prune(stats, dry_run)
+        self.stdout.write(
+            'Переименовано: {moved}, склеено с копиями: {merged}, '
+            'нет файла: {missing}, освобождено байт: {freed}'.format(**stats)
+        )
+        if options['prune']:
+            self.stdout.write(f'Удалено лишних файлов: {stats["pruned"]}')
+
+    def dedupe(self, name, stats, seen, dry_run):
+        with post_images.open(name) as file:
+            target = content_name(name, file)
+            if target in seen or post_images.exists(target):
+                stats['merged'] += 1
+                stats['freed'] += post_images.size(name)
+            seen.add(target)
+            stats['moved'] += 1
+            if dry_run:
+                return
+            new_name = post_images.save(name, file)
+        with transaction.atomic():
+            posts = Post.objects.filter(image=name)
+            rows = list(posts.values_list('id', 'author_id', 'group_id'))
+            posts.update(image=new_name, updated_at=timezone.now())
+            changes.record_many(
+                Post.objects.filter(id__in=[row[0] for row in rows]),
+                ChangeEvent.UPDATE,
+            )
+            transaction.on_commit(lambda: feed_cache.bump_posts(rows))
+        media.remove(name)
+
+    def prune(self, stats, dry_run):
+        pruned = 0
+        if not post_images.exists(POSTS_DIR):
+            return pruned
+        for name in walk(post_images, POSTS_DIR):
+            if media.is_referenced(name) or post_images.touched_since(
+                name, settings.MEDIA_RELEASE_GRACE
+            ):
+                continue
+            size = post_images.size(name)
+            if not dry_run:
+                media.remove(name)
+            pruned += 1
+            stats['freed'] += size
+        return pruned
@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает события журнала изменений после --since в JSONL; '
+        'seq последнего события — курсор для следующего запуска'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=int, default=0,
+            help='seq последнего уже полученного события',
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=tuple(changes.SNAPSHOT_FIELDS),
+            help='Только события этих моделей',
+        )
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.CHANGES_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл, в конец которого дописываются события, '
+                 'по умолчанию — stdout',
+        )
+        parser.add_argument(
+            '--follow', action='store_true',
+            help='Не завершаться, а ждать новых событий',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между опросами журнала в режиме --follow, секунд',
+        )
+
+    def handle(self, *args, **options):
+        since = options['since']
+        file = None
+        if options['output'] is None:
+            def write(line):
+                self.stdout.write(line, ending='')
+        else:
+            file = open(options['output'], 'a', encoding='utf-8')
+            write = file.write
+        try:
+            while True:
+                since, count = self.export(since, options, write)
+                if file is not None:
+                    file.flush()
+                if not options['follow']:
+                    break
+                if not count:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if file is not None:
+                file.close()
+        self.stderr.write(f'Последний seq: {since}')
+
+    def export(self, since, options, write):
+        count = 0
+        events = changes.events_after(
+            since, options['models'], options['limit'],
+            options['batch_size'],
+        )
+        for row in events:
+            write(changes.to_json(row))
+            since = row[0]
+            count += 1
+        return since, count
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporting
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты автора или группы в JSONL или CSV потоком; '
+        'результат можно загрузить обратно через import_posts'
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--author', help='Имя пользователя автора')
+        target.add_argument('--group', help='Slug группы')
+        target.add_argument(
+            '--all', action='store_true', help='Выгрузить все посты'
+        )
+        parser.add_argument(
+            '--format', choices=tuple(exporting.RENDERERS), default='jsonl'
+        )
+        parser.add_argument(
+            '--comments', action='store_true', help='Добавить комментарии'
+        )
+        parser.add_argument(
+            '--base-url', default=None,
+            help='Адрес сайта для ссылок на картинки, например '
+                 'https://yatube.example; без него ссылок нет',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для выгрузки, по умолчанию — stdout',
+        )
+
+    def get_posts(self, options):
+        if options['author']:
+            try:
+                return User.objects.get(username=options['author']).posts
+            except User.DoesNotExist:
+                raise CommandError(f'Нет автора {options["author"]}')
+        if options['group']:
+            try:
+                return Group.objects.get(slug=options['group']).posts
+            except Group.DoesNotExist:
+                raise CommandError(f'Нет группы {options["group"]}')
+        if options['all']:
+            return Post.objects
+        raise CommandError('Укажите --author, --group или --all')
+
+    def handle(self, *args, **options):
+        image_url = None
+        if options['base_url']:
+            base_url = options['base_url'].rstrip('/')
+
+            def image_url(image):
+                return base_url + image.url
+        records = exporting.export_records(
+            self.get_posts(options).all(),
+            comments=options['comments'],
+            image_url=image_url,
+            chunk_size=options['chunk_size'],
+        )
+        lines = exporting.RENDERERS[options['format']](records)
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file:
+            file.writelines(lines)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed_cache import stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша фрагментов лент'
+
+    def handle(self, *args, **options):
+        for kind, counts in stats().items():
+            total = counts['hits'] + counts['misses']
+            ratio = counts['hits'] / total if total else 0
+            self.stdout.write(
+                f'{kind}: hits={counts["hits"]} misses={counts["misses"]} '
+                f'hit_ratio={ratio:.2%}'
+            )
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def generate(name):
+    try:
+        thumbnails.generate(name)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры для картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число потоков для обработки картинок',
+        )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        total = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for _ in executor.map(generate, names.iterator()):
+                total += 1
+                if total % 100 == 0:
+                    self.stdout.write(f'Обработано картинок: {total}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Готово, обработано картинок: {total}')
+        )
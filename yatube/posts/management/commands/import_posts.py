@@ -0,0 +1,77 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import Importer, RecordError, read_records
+from posts.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, посты и комментарии из JSONL или CSV. '
+        'После сбоя повторный запуск продолжает с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSONL или CSV')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default=None,
+            help='Формат файла, по умолчанию — по расширению',
+        )
+        parser.add_argument(
+            '--type', choices=('group', 'post', 'comment'), default=None,
+            help='Вид записей, если в файле нет поля type',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей сохранять в одной транзакции',
+        )
+        parser.add_argument(
+            '--media-from', default=None,
+            help='Каталог, относительно которого указаны картинки',
+        )
+        parser.add_argument(
+            '--source', default=None,
+            help='Имя импорта для продолжения и связи комментариев с '
+                 'постами, по умолчанию — полный путь к файлу',
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help='Пропускать ошибочные записи вместо остановки',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать файл сначала, забыв сохранённую позицию. Посты '
+                 'с уже импортированным id пропускаются, комментарии '
+                 'добавляются заново',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        source = options['source'] or os.path.abspath(path)
+        if options['restart']:
+            ImportCheckpoint.objects.filter(source=source).delete()
+        importer = Importer(
+            source,
+            batch_size=options['batch_size'],
+            media_from=options['media_from'] or os.path.dirname(path),
+            skip_invalid=options['skip_invalid'],
+            log=self.stdout.write,
+        )
+        records = read_records(path, options['format'], options['type'])
+        try:
+            stats = importer.run(records)
+        except (RecordError, ValueError) as error:
+            raise CommandError(
+                f'{error}. Сохранённые пачки остались в базе, повторный '
+                f'запуск продолжит с первой несохранённой записи'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: ' + ', '.join(
+                f'{name}={count}' for name, count in sorted(stats.items())
+            ) + f', {importer.rate():.0f} записей/с'
+        ))
@@ -0,0 +1,104 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.counters import rebuild_counters
+from posts.search import rebuild_index
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу большим объёмом тестовых данных. Сигналы при этом '
+        'не срабатывают, поэтому в конце пересчитываются счётчики и '
+        'поисковый индекс, а кеш очищается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument(
+            '--comments-per-post', type=float, default=3,
+            help='Среднее число комментариев к посту',
+        )
+        parser.add_argument(
+            '--comments-alpha', type=float, default=1.5,
+            help='Параметр распределения Парето: чем меньше, тем длиннее '
+                 'хвост популярных обсуждений',
+        )
+        parser.add_argument(
+            '--max-comments', type=int, default=5000,
+            help='Наибольшее число комментариев к одному посту',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель закона Ципфа для выбора авторов и групп',
+        )
+        parser.add_argument(
+            '--no-group-ratio', type=float, default=0.2,
+            help='Доля постов без группы',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных',
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и slug групп',
+        )
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Не перестраивать поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Нужен хотя бы один автор и batch-size > 0')
+        if options['comments_alpha'] <= 1:
+            raise CommandError('--comments-alpha должен быть больше 1')
+        started = time.monotonic()
+        seeder = Seeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            prefix=options['prefix'],
+            log=self.stdout.write,
+        )
+        author_ids = seeder.create_users(options['users'])
+        group_ids = seeder.create_groups(options['groups'])
+        self.stdout.write(
+            f'Авторов: {len(author_ids)}, групп: {len(group_ids)}'
+        )
+        last_post_id = seeder.create_posts(
+            options['posts'], author_ids, group_ids,
+            no_group_ratio=options['no_group_ratio'],
+            exponent=options['zipf'],
+        )
+        comments = seeder.create_comments(
+            last_post_id, author_ids,
+            mean=options['comments_per_post'],
+            alpha=options['comments_alpha'],
+            limit=options['max_comments'],
+            exponent=options['zipf'],
+        )
+        self.stdout.write(f'Комментариев: {comments}')
+        with transaction.atomic():
+            rebuild_counters()
+        if not options['skip_search_index']:
+            with transaction.atomic():
+                rebuild_index(batch_size=options['batch_size'])
+        # Ленты и фрагменты в кеше не знают о новых постах.
+        cache.clear()
+        elapsed = time.monotonic() - started
+        rows = len(author_ids) + len(group_ids) + options['posts'] + comments
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с, {rows / elapsed:.0f} строк/с'
+        ))
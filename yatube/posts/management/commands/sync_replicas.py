@@ -0,0 +1,44 @@
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик. Нужна для '
+        'локальной проверки чтения из реплик; на PostgreSQL и MySQL '
+        'реплики обновляет сам сервер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='aliases',
+            help='Алиас реплики; по умолчанию все из REPLICA_DATABASES',
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+        aliases = options['aliases'] or settings.REPLICA_DATABASES
+        if not aliases:
+            raise CommandError('Реплики не настроены, задайте DB_REPLICAS')
+        unknown = set(aliases) - set(settings.REPLICA_DATABASES)
+        if unknown:
+            raise CommandError(
+                'Не реплики: %s' % ', '.join(sorted(unknown))
+            )
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            replica.close()
+            path = replica.settings_dict['NAME']
+            with closing(sqlite3.connect(path)) as target:
+                # backup() копирует согласованный снимок даже при записи
+                # в основную базу из других соединений.
+                primary.connection.backup(target)
+            self.stdout.write(f'{alias}: {path}')
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
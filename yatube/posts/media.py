@@ -0,0 +1,49 @@
+"""Удаление картинок постов, на которые больше никто не ссылается.
+
+Один файл может быть картинкой нескольких постов, поэтому перед
+удалением проверяется, что ссылок на него не осталось. Файл, который
+загружали недавно, не удаляется: на него может ссылаться пост, ещё не
+закоммиченный в другой транзакции. Такие файлы подбирает
+`dedupe_media --prune`.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+
+def is_referenced(name):
+    return Post.objects.filter(image=name).exists()
+
+
+def remove(name):
+    """Удаляет файл вместе с миниатюрами и их записями в хранилище sorl."""
+    delete(ImageFile(name, post_images), delete_file=True)
+
+
+def release(name):
+    """Удаляет картинку, если она больше не нужна ни одному посту."""
+    if (
+        not name
+        or is_referenced(name)
+        or post_images.touched_since(name, settings.MEDIA_RELEASE_GRACE)
+    ):
+        return False
+    try:
+        remove(name)
+    except OSError:
+        logger.exception('Не удалось удалить картинку %s', name)
+        return False
+    return True
+
+
+def schedule_release(name):
+    if name:
+        transaction.on_commit(lambda: release(name))
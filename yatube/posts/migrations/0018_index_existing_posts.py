@@ -0,0 +1,36 @@
+from collections import Counter
+
+from django.db import migrations
+
+from posts.search import tokenize
+
+BATCH_SIZE = 1000
+
+
+def index_posts(apps, schema_editor):
+    """Строит поисковый индекс для постов, созданных до SearchToken."""
+    Post = apps.get_model('posts', 'Post')
+    SearchToken = apps.get_model('posts', 'SearchToken')
+    SearchToken.objects.all().delete()
+    tokens = []
+    posts = Post.objects.order_by().values_list('pk', 'text')
+    for post_id, text in posts.iterator(chunk_size=BATCH_SIZE):
+        tokens.extend(
+            SearchToken(term=term, post_id=post_id, weight=min(weight, 32767))
+            for term, weight in Counter(tokenize(text)).items()
+        )
+        if len(tokens) >= BATCH_SIZE:
+            SearchToken.objects.bulk_create(tokens)
+            tokens = []
+    SearchToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_follow'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_posts, migrations.RunPython.noop),
+    ]
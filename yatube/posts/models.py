@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from .storage import post_images
 
 User = get_user_model()
 
@@ -8,6 +11,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -27,6 +35,9 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    # Меняется при каждом сохранении и ключует кеш блока поста в лентах;
+    # массовые update(), меняющие вид поста, обновляют его явно.
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -45,11 +56,38 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=post_images,
+        blank=True,
+        db_index=True,
+    )
+    # Заполняются при загрузке через PostForm и отдаются в API, чтобы
+    # клиенты знали размеры картинки, не скачивая её; у старых постов могут
+    # быть пустыми. На страницах сайта картинка всегда обрезана до 960×339.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки в байтах', null=True, blank=True, editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
     )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_pub_date_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -78,5 +116,158 @@ class Comment(models.Model):
     )
 
     class Meta:
+        ordering = ('created', 'id')
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора, обновляются при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Follow(models.Model):
+    """Подписка пользователя на автора."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор'
+    )
+    created = models.DateTimeField('Дата подписки', auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow',
+            ),
+        ]
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+
+    def __str__(self):
+        return f'{self.user} → {self.author}'
+
+
+class SearchToken(models.Model):
+    """Строка обратного индекса: основа слова и пост, где она встречается."""
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name='Пост'
+    )
+    weight = models.PositiveSmallIntegerField('Число вхождений', default=1)
+
+    class Meta:
+        unique_together = ('term', 'post')
+        verbose_name = 'Поисковый токен'
+        verbose_name_plural = 'Поисковые токены'
+
+    def __str__(self):
+        return self.term
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько записей файла импорта уже сохранено в базе."""
+    source = models.CharField('Источник', max_length=255, unique=True)
+    position = models.PositiveIntegerField('Обработано записей', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Состояние импорта'
+        verbose_name_plural = 'Состояния импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
+
+
+class ImportedPost(models.Model):
+    """Соответствие id поста в старой системе и поста на сайте."""
+    source = models.CharField('Источник', max_length=255)
+    legacy_id = models.CharField('Id в старой системе', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        unique_together = ('source', 'legacy_id')
+        verbose_name = 'Импортированный пост'
+        verbose_name_plural = 'Импортированные посты'
+
+    def __str__(self):
+        return f'{self.source}:{self.legacy_id}'
+
+
+class ChangeEvent(models.Model):
+    """Запись журнала изменений постов, комментариев и групп.
+
+    Журнал только дополняется; id события служит курсором для
+    потребителей, которые забирают изменения после известного id.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    model = models.CharField('Модель', max_length=16)
+    object_id = models.PositiveIntegerField('Id объекта')
+    action = models.CharField('Действие', max_length=8, choices=ACTIONS)
+    created = models.DateTimeField('Время', default=timezone.now)
+    # JSON со снимком полей объекта; у удалений пустой.
+    data = models.TextField('Данные', blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=['model', 'id'], name='change_model_id_idx'),
+        ]
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.id}: {self.action} {self.model} {self.object_id}'
@@ -0,0 +1,198 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+
+def encode_cursor(values, reverse=False):
+    """Упаковывает значения ключа сортировки в непрозрачную строку."""
+    payload = [
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in values
+    ]
+    raw = json.dumps({'k': payload, 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор. Возвращает (значения, reverse) или None."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(data['k']), bool(data['r'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+
+
+def cursor_after(obj, ordering):
+    """Курсор на страницу, которая начинается сразу после `obj`."""
+    return encode_cursor([
+        getattr(obj, field.lstrip('-')) for field in ordering
+    ])
+
+
+class TimelinePage(Page):
+    """Страница ленты с номерами.
+
+    Номера страниц ведут только в пределах окна кеша ленты: дальше
+    страница по номеру стоит `OFFSET`. Поэтому ссылка «Следующая» с
+    последней страницы окна ведёт на курсорную страницу, а номерных
+    ссылок за окном и ссылки на последнюю страницу нет.
+    """
+
+    @property
+    def next_cursor(self):
+        if (not self.has_next()
+                or self.next_page_number() <= self.paginator.linked_pages):
+            return None
+        return cursor_after(self.object_list[-1], self.paginator.ordering)
+
+    @property
+    def page_links(self):
+        return range(1, min(self.paginator.num_pages,
+                            self.paginator.linked_pages) + 1)
+
+    @property
+    def links_last(self):
+        return self.paginator.num_pages <= self.paginator.linked_pages
+
+
+class TimelinePaginator(Paginator):
+    """Постраничный паджинатор ленты.
+
+    Первые `linked_pages` страниц листаются по номерам, дальше — курсорами
+    `CursorPaginator` с тем же порядком `ordering`.
+    """
+
+    def __init__(self, object_list, per_page, linked_pages,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.linked_pages = linked_pages
+        self.ordering = tuple(ordering)
+
+    def _get_page(self, *args, **kwargs):
+        return TimelinePage(*args, **kwargs)
+
+
+class CursorPage(Page):
+    """Страница курсорной паджинации.
+
+    Совместима с шаблонами, которые работают с обычной `Page`, но вместо
+    номеров страниц хранит курсоры на соседние страницы. `cursor` — курсор
+    из запроса: по нему, а не по содержимому, различаются ключи кеша
+    фрагментов страницы.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None, is_first=False, cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.is_first = is_first
+        self.cursor = cursor
+
+    def __repr__(self):
+        return '<CursorPage %s>' % (self.cursor or 'first')
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return not self.is_first
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор: страница выбирается условием по ключу сортировки.
+
+    Не выполняет `COUNT(*)` и `OFFSET`, поэтому стоимость страницы не
+    зависит от её глубины. Ключ сортировки должен быть уникальным, поэтому
+    последним полем в `ordering` идёт `id`.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.fields]
+        return [getattr(obj, field) for field in self.fields]
+
+    def _filter(self, values, reverse):
+        condition = Q()
+        for index, ordering in enumerate(self.ordering):
+            descending = ordering.startswith('-') != reverse
+            lookup = '%s__%s' % (self.fields[index], 'lt' if descending
+                                 else 'gt')
+            step = Q(**{lookup: values[index]})
+            for field, value in zip(self.fields[:index], values[:index]):
+                step &= Q(**{field: value})
+            condition |= step
+        return condition
+
+    def page(self, cursor):
+        decoded = decode_cursor(cursor)
+        if decoded is not None and len(decoded[0]) != len(self.fields):
+            decoded = None
+        queryset = self.object_list
+        reverse = False
+        if decoded is not None:
+            values, reverse = decoded
+            queryset = queryset.filter(self._filter(values, reverse))
+        if reverse:
+            queryset = queryset.order_by(*[
+                field[1:] if field.startswith('-') else '-' + field
+                for field in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        if not rows:
+            return CursorPage(
+                rows, self, is_first=decoded is None, cursor=cursor
+            )
+        first_cursor = encode_cursor(self._key(rows[0]), reverse=True)
+        last_cursor = encode_cursor(self._key(rows[-1]))
+        if reverse:
+            return CursorPage(
+                rows, self,
+                next_cursor=last_cursor,
+                previous_cursor=first_cursor if has_more else None,
+                is_first=not has_more,
+                cursor=cursor,
+            )
+        return CursorPage(
+            rows, self,
+            next_cursor=last_cursor if has_more else None,
+            previous_cursor=first_cursor if decoded is not None else None,
+            is_first=decoded is None,
+            cursor=cursor,
+        )
+
+    def get_page(self, cursor):
+        return self.page(cursor)
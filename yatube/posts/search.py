@@ -0,0 +1,148 @@
+"""Полнотекстовый поиск по постам.
+
+Текст поста разбивается на слова, слова приводятся к основе стеммером
+Портера для русского языка и сохраняются в таблицу `SearchToken`
+(обратный индекс «основа → пост»). Индекс обновляется сигналами при
+сохранении поста, а при удалении поста строки удаляются каскадно.
+"""
+import re
+from collections import Counter
+
+from django.db.models import Count, Sum
+
+from .models import Post, SearchToken
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+STOP_WORDS = frozenset((
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а',
+    'то', 'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же',
+    'вы', 'за', 'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от',
+    'меня', 'еще', 'нет', 'о', 'из', 'ему', 'ли', 'если', 'или', 'ни',
+    'быть', 'был', 'до', 'вас', 'уже', 'для', 'мы', 'их', 'это', 'при',
+))
+
+RV_RE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND_RE = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE_RE = re.compile(r'(с[яь])$')
+ADJECTIVE_RE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE_RE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB_RE = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|'
+    r'йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN_RE = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL_RE = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_ENDING_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Возвращает основу русского слова (алгоритм Портера)."""
+    word = word.lower().replace('ё', 'е')
+    match = RV_RE.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    cut = PERFECTIVE_GERUND_RE.sub('', rv, 1)
+    if cut == rv:
+        rv = REFLEXIVE_RE.sub('', rv, 1)
+        cut = ADJECTIVE_RE.sub('', rv, 1)
+        if cut != rv:
+            rv = PARTICIPLE_RE.sub('', cut, 1)
+        else:
+            cut = VERB_RE.sub('', rv, 1)
+            rv = NOUN_RE.sub('', rv, 1) if cut == rv else cut
+    else:
+        rv = cut
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if DERIVATIONAL_RE.match(rv):
+        rv = DERIVATIONAL_ENDING_RE.sub('', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE_RE.sub('', rv, 1)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text):
+    """Список основ слов текста без стоп-слов."""
+    terms = []
+    for word in TOKEN_RE.findall(text.lower().replace('ё', 'е')):
+        if word in STOP_WORDS or len(word) < 2 and not word.isdigit():
+            continue
+        terms.append(stem(word)[:MAX_TERM_LENGTH])
+    return terms
+
+
+def build_tokens(post_id, text):
+    """Несохранённые строки индекса для текста поста."""
+    return [
+        SearchToken(term=term, post_id=post_id, weight=min(weight, 32767))
+        for term, weight in Counter(tokenize(text)).items()
+    ]
+
+
+def index_post(post):
+    """Перестраивает строки индекса для одного поста."""
+    SearchToken.objects.filter(post_id=post.pk).delete()
+    SearchToken.objects.bulk_create(build_tokens(post.pk, post.text))
+
+
+def rebuild_index(batch_size=1000):
+    """Переиндексирует все посты. Возвращает число постов."""
+    SearchToken.objects.all().delete()
+    tokens = []
+    total = 0
+    posts = Post.objects.order_by().values_list('pk', 'text')
+    for post_id, text in posts.iterator(chunk_size=batch_size):
+        total += 1
+        tokens.extend(build_tokens(post_id, text))
+        if len(tokens) >= batch_size:
+            SearchToken.objects.bulk_create(tokens)
+            tokens = []
+    SearchToken.objects.bulk_create(tokens)
+    return total
+
+
+def query_terms(query):
+    return sorted(set(tokenize(query)))
+
+
+def ranked_post_ids(query, require_all=False):
+    """Queryset id подходящих постов, отсортированный по релевантности.
+
+    Сначала идут посты, в которых нашлось больше слов запроса, затем —
+    с большей суммарной частотой этих слов, затем — более новые.
+    """
+    terms = query_terms(query)
+    matches = (
+        SearchToken.objects.filter(term__in=terms)
+        .values('post')
+        .annotate(matched=Count('term'), score=Sum('weight'))
+    )
+    if require_all:
+        matches = matches.filter(matched=len(terms))
+    return matches.order_by('-matched', '-score', '-post_id').values_list(
+        'post', flat=True
+    )
+
+
+def hydrate(post_ids, queryset=None):
+    """Загружает посты одним запросом и сохраняет порядок `post_ids`."""
+    if queryset is None:
+        queryset = Post.objects.select_related('group', 'author')
+    posts = queryset.in_bulk(list(post_ids))
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
@@ -0,0 +1,206 @@
+"""Генерация больших объёмов тестовых данных.
+
+Записи создаются через `bulk_create` пачками, поэтому сигналы не
+срабатывают: счётчики и поисковый индекс пересчитываются в конце
+отдельными проходами. Авторы и группы выбираются по закону Ципфа,
+а число комментариев к посту — по распределению Парето, чтобы данные
+были похожи на настоящие: немного популярных авторов и обсуждений
+и длинный хвост остальных.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from .models import Comment, Group, Post, User
+
+TEXT_POOL_SIZE = 2000
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса закона Ципфа для `random.choices`."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def comments_count(rng, mean, alpha, limit):
+    """Число комментариев с распределением Парето и заданным средним."""
+    if mean <= 0:
+        return 0
+    value = (rng.paretovariate(alpha) - 1) * mean * (alpha - 1)
+    return min(int(value), limit)
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает `auto_now_add`, чтобы сохранить даты из прошлого."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class Seeder:
+    def __init__(self, *, seed=None, batch_size=5000, days=365,
+                 prefix='seed', log=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.prefix = prefix
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.total_posts = 0
+        self._texts = None
+
+    @property
+    def texts(self):
+        # Faker медленный, поэтому тексты берутся из заранее собранного пула.
+        if self._texts is None:
+            self._texts = [
+                self.fake.paragraph(nb_sentences=self.rng.randint(1, 8))
+                for _ in range(TEXT_POOL_SIZE)
+            ]
+        return self._texts
+
+    def _bulk_create(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+
+    def _new_ids(self, model, last_id):
+        return list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def _last_id(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def create_users(self, count):
+        start = User.objects.filter(username__startswith=self.prefix).count()
+        last_id = self._last_id(User)
+        password = make_password(None)
+        self._bulk_create(User, [
+            User(
+                username=f'{self.prefix}_user_{start + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+                date_joined=self.now,
+            )
+            for number in range(count)
+        ])
+        return self._new_ids(User, last_id)
+
+    def create_groups(self, count):
+        start = Group.objects.filter(slug__startswith=self.prefix).count()
+        last_id = self._last_id(Group)
+        self._bulk_create(Group, [
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.prefix}-group-{start + number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(count)
+        ])
+        return self._new_ids(Group, last_id)
+
+    def _pub_dates(self, first, count):
+        """Возрастающие даты одной пачки внутри её доли интервала."""
+        span = timedelta(days=self.days) / max(self.total_posts, 1)
+        start = self.now - timedelta(days=self.days) + span * first
+        return sorted(
+            start + span * count * self.rng.random() for _ in range(count)
+        )
+
+    def create_posts(self, count, author_ids, group_ids, no_group_ratio,
+                     exponent):
+        """Создаёт посты пачками, от старых к новым."""
+        self.total_posts = count
+        last_id = self._last_id(Post)
+        author_weights = zipf_weights(len(author_ids), exponent)
+        group_weights = zipf_weights(len(group_ids), exponent)
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            authors = self.rng.choices(
+                author_ids, cum_weights=author_weights, k=size
+            )
+            groups = (
+                self.rng.choices(group_ids, cum_weights=group_weights, k=size)
+                if group_ids else [None] * size
+            )
+            posts = [
+                Post(
+                    text=self.rng.choice(self.texts),
+                    author_id=author_id,
+                    group_id=(
+                        None if self.rng.random() < no_group_ratio
+                        else group_id
+                    ),
+                    pub_date=pub_date,
+                )
+                for author_id, group_id, pub_date in zip(
+                    authors, groups, self._pub_dates(created, size)
+                )
+            ]
+            with explicit_dates(Post._meta.get_field('pub_date')):
+                self._bulk_create(Post, posts)
+            created += size
+            self.log(f'Постов: {created}/{count}')
+        return last_id
+
+    def create_comments(self, after_post_id, author_ids, mean, alpha, limit,
+                        exponent):
+        """Создаёт комментарии к постам с id больше `after_post_id`."""
+        author_weights = zipf_weights(len(author_ids), exponent)
+        posts = (
+            Post.objects.filter(pk__gt=after_post_id)
+            .order_by('pk')
+            .values_list('pk', 'pub_date')
+        )
+        field = Comment._meta.get_field('created')
+        batch = []
+        total = 0
+        for post_id, pub_date in posts.iterator(chunk_size=self.batch_size):
+            count = comments_count(self.rng, mean, alpha, limit)
+            if not count:
+                continue
+            authors = self.rng.choices(
+                author_ids, cum_weights=author_weights, k=count
+            )
+            age = (self.now - pub_date).total_seconds()
+            batch.extend(
+                Comment(
+                    post_id=post_id,
+                    author_id=author_id,
+                    text=self.rng.choice(self.texts),
+                    created=pub_date + timedelta(
+                        seconds=age * self.rng.random()
+                    ),
+                )
+                for author_id in authors
+            )
+            if len(batch) >= self.batch_size:
+                with explicit_dates(field):
+                    self._bulk_create(Comment, batch)
+                total += len(batch)
+                batch = []
+                self.log(f'Комментариев: {total}')
+        with explicit_dates(field):
+            self._bulk_create(Comment, batch)
+        return total + len(batch)
@@ -0,0 +1,199 @@
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import (changes, counters, feed_cache, following, media, search,
+               thumbnails, timelines)
+from .models import ChangeEvent, Comment, Follow, Group, Post, User
+
+GROUP_DELETE_BATCH_SIZE = 1000
+
+
+@receiver(post_init, sender=Post)
+def remember_post_relations(sender, instance, **kwargs):
+    """Запоминает исходные автора и группу, чтобы отследить их смену."""
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_post(sender, instance, **kwargs):
+    instance._loaded_post_id = instance.__dict__.get('post_id')
+
+
+@receiver(post_init, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._loaded_slug = instance.__dict__.get('slug')
+    instance._loaded_title = instance.__dict__.get('title')
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._loaded_username = instance.__dict__.get('username')
+    instance._loaded_names = user_names(instance)
+
+
+def user_names(user):
+    """Поля пользователя, которые видны на страницах с его постами."""
+    return tuple(
+        user.__dict__.get(field)
+        for field in ('username', 'first_name', 'last_name')
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    changes.record(
+        instance, ChangeEvent.CREATE if created else ChangeEvent.UPDATE
+    )
+    if instance._loaded_slug != instance.slug:
+        feed_cache.forget('group', instance._loaded_slug)
+    if created or (instance._loaded_slug, instance._loaded_title) == (
+        instance.slug, instance.title
+    ):
+        feed_cache.bump(feed_cache.group_namespace(instance.id))
+    else:
+        feed_cache.bump_group(instance.id)
+    instance._loaded_slug = instance.slug
+    instance._loaded_title = instance.title
+
+
+@receiver(pre_delete, sender=Group)
+def record_group_posts(sender, instance, **kwargs):
+    """События изменения постов группы: после удаления их группа обнулится.
+
+    Сигнал приходит в транзакции удаления, поэтому события попадут в журнал
+    только вместе с ним. Посты читаются пачками, а не списком целиком.
+    """
+    posts = instance.posts.order_by()
+    batch = []
+    for post in posts.iterator(chunk_size=GROUP_DELETE_BATCH_SIZE):
+        post.group_id = None
+        batch.append(post)
+        if len(batch) >= GROUP_DELETE_BATCH_SIZE:
+            changes.record_many(batch, ChangeEvent.UPDATE)
+            batch = []
+    changes.record_many(batch, ChangeEvent.UPDATE)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    feed_cache.forget('group', instance.slug)
+    changes.record(instance, ChangeEvent.DELETE)
+    feed_cache.bump_group(instance.id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Сбрасывает страницы с именем пользователя, если оно изменилось."""
+    if created or instance._loaded_names == user_names(instance):
+        return
+    if instance._loaded_username != instance.username:
+        feed_cache.forget('author', instance._loaded_username)
+    feed_cache.bump_user(instance.id)
+    instance._loaded_username = instance.username
+    instance._loaded_names = user_names(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    feed_cache.forget('author', instance.username)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_author_id = instance._loaded_author_id
+    old_group_id = instance._loaded_group_id
+    follow_keys = following.fanout_keys([instance.author_id])
+    if created:
+        counters.change_author_posts(instance.author_id, 1)
+        counters.change_group_posts(instance.group_id, 1)
+    else:
+        if old_author_id != instance.author_id:
+            counters.change_author_posts(old_author_id, -1)
+            counters.change_author_posts(instance.author_id, 1)
+        if old_group_id != instance.group_id:
+            counters.change_group_posts(old_group_id, -1)
+            counters.change_group_posts(instance.group_id, 1)
+        old_follow_keys = follow_keys
+        if old_author_id != instance.author_id:
+            old_follow_keys = following.fanout_keys([old_author_id])
+        timelines.remove_post(
+            instance.id,
+            timelines.post_keys(old_author_id, old_group_id)
+            + old_follow_keys,
+        )
+        if instance._loaded_image != instance.image.name:
+            media.schedule_release(instance._loaded_image)
+        if old_author_id != instance.author_id:
+            feed_cache.forget('post', instance.id)
+    feed_cache.bump_posts([
+        (instance.id, old_author_id, old_group_id),
+        (instance.id, instance.author_id, instance.group_id),
+    ])
+    timelines.add_post(
+        instance,
+        timelines.post_keys(instance.author_id, instance.group_id)
+        + follow_keys,
+    )
+    search.index_post(instance)
+    thumbnails.schedule(instance)
+    changes.record(
+        instance, ChangeEvent.CREATE if created else ChangeEvent.UPDATE
+    )
+    instance._loaded_author_id = instance.author_id
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author_posts(instance.author_id, -1)
+    counters.change_group_posts(instance.group_id, -1)
+    timelines.remove_post(
+        instance.id,
+        timelines.post_keys(instance.author_id, instance.group_id)
+        + following.fanout_keys([instance.author_id]),
+    )
+    feed_cache.bump_posts([
+        (instance.id, instance.author_id, instance.group_id)
+    ])
+    feed_cache.forget('post', instance.id)
+    media.schedule_release(instance.image.name)
+    changes.record(instance, ChangeEvent.DELETE)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+    elif instance._loaded_post_id != instance.post_id:
+        counters.change_post_comments(instance._loaded_post_id, -1)
+        counters.change_post_comments(instance.post_id, 1)
+    instance._loaded_post_id = instance.post_id
+    feed_cache.bump(feed_cache.post_namespace(instance.post_id))
+    changes.record(
+        instance, ChangeEvent.CREATE if created else ChangeEvent.UPDATE
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post_comments(instance.post_id, -1)
+    feed_cache.bump(feed_cache.post_namespace(instance.post_id))
+    changes.record(instance, ChangeEvent.DELETE)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_following(instance.user_id, 1)
+        timelines.reset([timelines.follow_key(instance.user_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_following(instance.user_id, -1)
+    timelines.reset([timelines.follow_key(instance.user_id)])
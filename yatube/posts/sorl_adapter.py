@@ -0,0 +1,67 @@
+"""Обращения к внутренним API sorl-thumbnail.
+
+Публичный API sorl не умеет вычислять имя миниатюры, не создавая её, и
+читать записи хранилища пачкой, а без этого миниатюры нельзя готовить в
+фоне. Все обращения к закрытым методам и классам sorl собраны здесь и
+сверены с sorl-thumbnail 12.6: при обновлении sorl проверять нужно только
+этот модуль.
+"""
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+def thumbnail_name(source, geometry_string, options):
+    """Имя файла миниатюры `source`.
+
+    Повторяет вычисление из `ThumbnailBackend.get_thumbnail`, чтобы ключ в
+    хранилище совпадал с тем, что запишет sorl.
+    """
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry_string, options)
+
+
+def get(key):
+    """Готовая миниатюра из хранилища sorl или None."""
+    return default.kvstore._get(key)
+
+
+def get_many(keys):
+    """Читает записи хранилища пачкой: один get_many и один запрос."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get(key) for key in keys}
+    raw_keys = {add_prefix(key): key for key in keys}
+    values = kvstore.cache.get_many(list(raw_keys))
+    missing = [raw for raw in raw_keys if raw not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        kvstore.cache.set_many(
+            {raw: stored.get(raw, EMPTY_VALUE) for raw in missing},
+            thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        values.update(stored)
+    return {
+        key: deserialize_image_file(values[raw])
+        for raw, key in raw_keys.items()
+        if values.get(raw, EMPTY_VALUE) != EMPTY_VALUE
+    }
@@ -0,0 +1,60 @@
+"""Хранилище картинок постов с именами по содержимому.
+
+Файл называется SHA-256 своего содержимого: `posts/ab/cdef….webp`.
+Повторная загрузка той же картинки не создаёт копию, а возвращает имя
+уже сохранённого файла, поэтому у одинаковых картинок общие и файл, и
+миниатюры sorl (ключ миниатюры зависит от имени исходника).
+"""
+import hashlib
+import os
+import posixpath
+import re
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{62}(\.\w+)?$')
+
+
+def content_name(name, content):
+    """Имя файла по SHA-256 содержимого в каталоге `name`."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    hexdigest = digest.hexdigest()
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(
+        posixpath.dirname(name), hexdigest[:2], hexdigest[2:] + extension
+    )
+
+
+def is_content_name(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        name = content_name(name, content)
+        if self.exists(name):
+            try:
+                # Свежее время изменения не даёт удалить файл, на который
+                # ещё не успел сослаться сохраняемый пост.
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        return super()._save(name, content)
+
+    def touched_since(self, name, seconds):
+        """Менялся или загружался ли файл за последние `seconds` секунд."""
+        try:
+            modified = os.path.getmtime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return time.time() - modified < seconds
+
+
+post_images = ContentAddressedStorage()
@@ -0,0 +1,151 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class ApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'Пост {number}',
+                image=f'posts/api{number}.gif' if number == 14 else '',
+            )
+            for number in range(15)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_index_default_fields(self):
+        """Лента отдаёт посты с полями по умолчанию"""
+        data = self.get_json(reverse('posts:api_index'))
+        first = data['results'][0]
+        self.assertEqual(
+            set(first),
+            {'id', 'text', 'pub_date', 'author', 'group', 'image',
+             'comments_count'},
+        )
+        self.assertEqual(first['id'], self.post.id)
+        self.assertEqual(first['author'], 'Author')
+        self.assertEqual(first['group'], None)
+        self.assertEqual(first['image'], '/media/posts/api14.gif')
+        self.assertEqual(first['comments_count'], 3)
+        self.assertEqual(len(data['results']), 10)
+
+    def test_image_url_from_field_storage(self):
+        """Адрес картинки строит хранилище поля, как и на сайте"""
+        storage = Post._meta.get_field('image').storage
+        with mock.patch.object(storage, 'url', return_value='/cdn/api.gif'):
+            data = self.get_json(reverse('posts:api_index'))
+        self.assertEqual(data['results'][0]['image'], '/cdn/api.gif')
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertIsNone(data['previous_cursor'])
+
+    def test_field_selection(self):
+        """Параметр fields оставляет в ответе только нужные поля"""
+        data = self.get_json(
+            reverse('posts:api_index'), fields='id,group_title'
+        )
+        self.assertEqual(
+            data['results'][1],
+            {'id': self.posts[-2].id, 'group_title': 'Тестовая группа'},
+        )
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_cursor_paging(self):
+        """Курсоры проходят ленту без пропусков и повторов"""
+        url = reverse('posts:api_profile', kwargs={'username': 'Author'})
+        ids = []
+        data = self.get_json(url, fields='id')
+        while True:
+            ids += [item['id'] for item in data['results']]
+            if not data['next_cursor']:
+                break
+            data = self.get_json(url, fields='id', cursor=data['next_cursor'])
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        previous = self.get_json(
+            url, fields='id', cursor=data['previous_cursor']
+        )
+        self.assertEqual(len(previous['results']), 10)
+
+    def test_group_and_missing_objects(self):
+        """Лента группы и 404 для неизвестных группы, автора и поста"""
+        data = self.get_json(
+            reverse('posts:api_group_posts', kwargs={'slug': 'test_slug'})
+        )
+        self.assertEqual(len(data['results']), 7)
+        self.assertTrue(
+            all(item['group'] == 'test_slug' for item in data['results'])
+        )
+        for url in (
+            reverse('posts:api_group_posts', kwargs={'slug': 'missing'}),
+            reverse('posts:api_profile', kwargs={'username': 'missing'}),
+            reverse('posts:api_post_detail', kwargs={'post_id': 999}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся вместе с порцией комментариев"""
+        data = self.get_json(
+            reverse('posts:api_post_detail', kwargs={'post_id': self.post.id}),
+            fields='id,text', comment_fields='text',
+        )
+        self.assertEqual(data['post'], {'id': self.post.id, 'text': 'Пост 14'})
+        self.assertEqual(
+            data['results'],
+            [{'text': f'Комментарий {number}'} for number in range(3)],
+        )
+
+    @override_settings(SHARED_CACHE=True)
+    def test_conditional_get(self):
+        """Неизменившаяся лента отдаёт 304 по ETag"""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_budget(self):
+        """Эндпоинты укладываются в бюджет запросов"""
+        for url in (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', kwargs={'slug': 'test_slug'}),
+            reverse('posts:api_profile', kwargs={'username': 'Author'}),
+            reverse('posts:api_post_detail', kwargs={'post_id': self.post.id}),
+        ):
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget('get', url)
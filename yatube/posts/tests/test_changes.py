@@ -0,0 +1,259 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import changes, thumbnails
+from ..importing import Importer
+from ..models import ChangeEvent, Comment, Group, Post
+from .utils import QueryBudgetMixin, capture_query_plans, plan_problems
+
+User = get_user_model()
+
+
+def read_lines(response):
+    return [
+        json.loads(line)
+        for line in b''.join(response.streaming_content).decode().splitlines()
+    ]
+
+
+class ChangeLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def events(self, since=0):
+        return list(
+            ChangeEvent.objects.filter(id__gt=since).values_list(
+                'model', 'object_id', 'action'
+            )
+        )
+
+    def test_writes_are_recorded(self):
+        """Создание, правка и удаление попадают в журнал по порядку"""
+        since = ChangeEvent.objects.last().id
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Комментарий'
+        )
+        post.text = 'Новый текст'
+        post.save()
+        post_id, comment_id = post.id, comment.id
+        post.delete()
+        self.assertEqual(self.events(since), [
+            ('post', post_id, ChangeEvent.CREATE),
+            ('comment', comment_id, ChangeEvent.CREATE),
+            ('post', post_id, ChangeEvent.UPDATE),
+            ('comment', comment_id, ChangeEvent.DELETE),
+            ('post', post_id, ChangeEvent.DELETE),
+        ])
+        update = ChangeEvent.objects.filter(action=ChangeEvent.UPDATE).last()
+        data = json.loads(update.data)
+        self.assertEqual(data['text'], 'Новый текст')
+        self.assertEqual(data['group_id'], self.group.id)
+
+    def test_group_events(self):
+        self.assertEqual(
+            self.events(), [('group', self.group.id, ChangeEvent.CREATE)]
+        )
+        group = Group.objects.create(title='Другая', slug='other')
+        group_id = group.id
+        group.delete()
+        self.assertEqual(self.events()[1:], [
+            ('group', group_id, ChangeEvent.CREATE),
+            ('group', group_id, ChangeEvent.DELETE),
+        ])
+
+    def test_group_delete_updates_posts(self):
+        """Посты удалённой группы получают события с обнулённой группой"""
+        group = Group.objects.create(title='Другая', slug='other')
+        post = Post.objects.create(author=self.author, group=group, text='П')
+        since = ChangeEvent.objects.last().id
+        group_id = group.id
+        group.delete()
+        self.assertEqual(self.events(since), [
+            ('post', post.id, ChangeEvent.UPDATE),
+            ('group', group_id, ChangeEvent.DELETE),
+        ])
+        data = json.loads(
+            ChangeEvent.objects.get(model='post', id__gt=since).data
+        )
+        self.assertIsNone(data['group_id'])
+
+    def test_thumbnail_generation_updates_posts(self):
+        """Новая миниатюра меняет updated_at поста и пишет событие"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image='posts/picture.png'
+        )
+        since = ChangeEvent.objects.last().id
+        with mock.patch('posts.thumbnails.get_thumbnail'):
+            thumbnails.generate('posts/picture.png')
+        self.assertEqual(
+            self.events(since), [('post', post.id, ChangeEvent.UPDATE)]
+        )
+        # Миниатюры уже готовы: повторный вызов ничего не пишет
+        since = ChangeEvent.objects.last().id
+        updated_at = Post.objects.get(pk=post.pk).updated_at
+        ready = mock.patch(
+            'posts.sorl_adapter.get_many',
+            side_effect=lambda keys: dict.fromkeys(keys, mock.Mock()),
+        )
+        with ready, mock.patch('posts.feed_cache.bump_posts') as bump_posts:
+            with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+                thumbnails.generate('posts/picture.png')
+        get_thumbnail.assert_not_called()
+        bump_posts.assert_not_called()
+        self.assertEqual(self.events(since), [])
+        self.assertEqual(Post.objects.get(pk=post.pk).updated_at, updated_at)
+
+    def test_events_after_batches(self):
+        """Курсор отдаёт события после since пачками и с лимитом"""
+        for number in range(5):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        first = ChangeEvent.objects.first().id
+        rows = list(changes.events_after(first, batch_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual([row[0] for row in rows], sorted(r[0] for r in rows))
+        self.assertEqual(
+            len(list(changes.events_after(first, limit=3, batch_size=2))), 3
+        )
+        self.assertEqual(
+            list(changes.events_after(rows[-1][0], batch_size=2)), []
+        )
+
+    def test_filtered_read_uses_index(self):
+        plans = capture_query_plans(
+            lambda: list(changes.events_after(0, ['post'], batch_size=10))
+        )
+        self.assertTrue(plans)
+        self.assertEqual(plan_problems(plans), [])
+
+
+class ChangeImportTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def test_import_records_events(self):
+        """Импорт через bulk_create тоже пишет события с верными id"""
+        path = os.path.join(self.media, 'data.jsonl')
+        records = [
+            {'type': 'group', 'slug': 'imported', 'title': 'Группа'},
+            {'type': 'post', 'id': 1, 'author': 'legacy', 'text': 'Пост',
+             'group': 'imported'},
+            {'type': 'comment', 'post': 1, 'author': 'legacy',
+             'text': 'Комментарий'},
+        ]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+        Importer('test', batch_size=10).run(
+            json.loads(line) for line in open(path, encoding='utf-8')
+        )
+        post = Post.objects.get()
+        self.assertEqual(
+            list(ChangeEvent.objects.values_list('model', 'object_id')),
+            [
+                ('group', Group.objects.get().id),
+                ('post', post.id),
+                ('comment', Comment.objects.get().id),
+            ],
+        )
+        data = json.loads(ChangeEvent.objects.get(model='post').data)
+        self.assertEqual(data['text'], 'Пост')
+        self.assertEqual(data['group_id'], post.group_id)
+
+
+@override_settings(CHANGES_API_TOKEN='secret')
+class ChangesApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.url = reverse('posts:api_changes')
+
+    def get(self, data=None):
+        return self.client.get(
+            self.url, data, HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+    def test_access(self):
+        """Журнал доступен модераторам и по токену"""
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(
+            self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code,
+            403,
+        )
+        self.assertEqual(self.get().status_code, 200)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_stream_and_cursor(self):
+        lines = read_lines(self.get())
+        self.assertEqual(
+            [(line['model'], line['action']) for line in lines],
+            [('group', 'create'), ('post', 'create'), ('comment', 'create')],
+        )
+        self.assertEqual(lines[1]['id'], self.post.id)
+        self.assertEqual(lines[1]['data']['text'], 'Пост')
+        self.assertEqual(read_lines(self.get({'since': lines[-1]['seq']})), [])
+        self.post.delete()
+        tail = read_lines(self.get({'since': lines[-1]['seq']}))
+        self.assertEqual(
+            [(line['model'], line['action'], line['data']) for line in tail],
+            [('comment', 'delete', None), ('post', 'delete', None)],
+        )
+
+    def test_filters(self):
+        lines = read_lines(self.get({'models': 'post', 'limit': 5}))
+        self.assertEqual([line['model'] for line in lines], ['post'])
+        self.assertEqual(len(read_lines(self.get({'limit': 1}))), 1)
+        for data in ({'models': 'user'}, {'since': 'x'}, {'limit': 0}):
+            with self.subTest(data=data):
+                self.assertEqual(self.get(data).status_code, 400)
+
+    def test_within_budget(self):
+        self.client.force_login(self.staff)
+        self.assertWithinQueryBudget('get', self.url)
+
+
+class ExportChangesCommandTest(TestCase):
+    def test_export_and_resume(self):
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(author=author, text='Первый')
+        out, err = StringIO(), StringIO()
+        call_command('export_changes', stdout=out, stderr=err)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line['data']['text'] for line in lines], ['Первый'])
+        self.assertIn(str(lines[-1]['seq']), err.getvalue())
+        Post.objects.create(author=author, text='Второй')
+        out = StringIO()
+        call_command(
+            'export_changes', since=lines[-1]['seq'], models=['post'],
+            stdout=out, stderr=StringIO(),
+        )
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line['data']['text'] for line in lines], ['Второй'])
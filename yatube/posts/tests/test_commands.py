@@ -0,0 +1,256 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from ..models import AuthorStats, Comment, Group, Post, SearchToken, User
+from ..storage import is_content_name
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SeedDataCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, **options):
+        call_command(
+            'seed_data', users=5, groups=3, posts=40, batch_size=15,
+            seed=1, stdout=StringIO(), **options
+        )
+
+    def test_seed_data_creates_rows(self):
+        """seed_data создаёт записи и пересчитывает счётчики и индекс"""
+        self.seed(comments_per_post=2)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(
+            AuthorStats.objects.aggregate(total=Sum('posts_count'))['total'],
+            40,
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'],
+            Comment.objects.count(),
+        )
+        self.assertTrue(SearchToken.objects.exists())
+
+    def test_seed_data_spreads_dates(self):
+        """Посты получают разные даты публикации в прошлом"""
+        self.seed(comments_per_post=0, days=30)
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(len(set(dates)), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_seed_data_can_run_twice(self):
+        """Повторный запуск не конфликтует по именам и slug"""
+        self.seed(comments_per_post=0)
+        self.seed(comments_per_post=0)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 6)
+
+
+class BenchmarkViewsCommandTest(TestCase):
+    def test_benchmark_report(self):
+        """benchmark_views сохраняет отчёт в JSON"""
+        cache.clear()
+        call_command(
+            'seed_data', users=3, groups=2, posts=15, seed=1,
+            stdout=StringIO(),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_views', repeat=2, output=path, stdout=StringIO()
+            )
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            output = StringIO()
+            call_command(
+                'benchmark_views', repeat=2, baseline=path, stdout=output
+            )
+        self.assertEqual(report['meta']['rows']['posts'], 15)
+        for name in ('index', 'group_posts', 'profile', 'post_detail'):
+            with self.subTest(name=name):
+                result = report['results'][name]
+                self.assertEqual(result['status'], 200)
+                self.assertLessEqual(
+                    result['latency_ms']['p50'], result['latency_ms']['max']
+                )
+        self.assertIn('post_detail: p50', output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_jsonl(self, records, name='import.jsonl'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def import_posts(self, path, **options):
+        call_command('import_posts', path, stdout=StringIO(), **options)
+
+    def test_import_jsonl(self):
+        """Импорт создаёт группы, посты, комментарии и копирует картинки"""
+        with open(os.path.join(self.directory, 'cat.gif'), 'wb') as file:
+            file.write(b'GIF89a')
+        path = self.write_jsonl([
+            {'type': 'group', 'slug': 'cats', 'title': 'Коты',
+             'description': 'Про котов'},
+            {'type': 'post', 'id': 1, 'author': 'leo', 'group': 'cats',
+             'text': 'Первый пост про кота', 'image': 'cat.gif',
+             'pub_date': '2015-03-01T10:00:00'},
+            {'type': 'post', 'id': 2, 'author': 'leo', 'group': 'dogs',
+             'text': 'Второй пост'},
+            {'type': 'comment', 'post': 1, 'author': 'anna',
+             'text': 'Отличный кот', 'created': '2015-03-02T10:00:00'},
+        ])
+        self.import_posts(path, batch_size=2)
+        self.assertEqual(
+            set(Group.objects.values_list('slug', flat=True)),
+            {'cats', 'dogs'},
+        )
+        first = Post.objects.get(text='Первый пост про кота')
+        self.assertEqual(first.author.username, 'leo')
+        self.assertEqual(first.group.title, 'Коты')
+        self.assertEqual(first.pub_date.year, 2015)
+        self.assertEqual(first.comments_count, 1)
+        self.assertEqual(first.comments.get().author.username, 'anna')
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertTrue(os.path.exists(first.image.path))
+        self.assertEqual(first.author.stats.posts_count, 2)
+        self.assertEqual(Group.objects.get(slug='cats').posts_count, 1)
+        self.assertTrue(
+            SearchToken.objects.filter(post=first, term='кот').exists()
+        )
+
+    def test_import_csv(self):
+        """CSV без поля type импортируется с --type"""
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            file.write('id,author,text\n7,leo,"Пост, с запятой"\n')
+        self.import_posts(path, type='post')
+        self.assertEqual(Post.objects.get().text, 'Пост, с запятой')
+
+    def test_resume_after_failure(self):
+        """После ошибки импорт продолжается без повторов"""
+        records = [
+            {'type': 'post', 'id': number, 'author': 'leo',
+             'text': f'Пост {number}'}
+            for number in range(6)
+        ]
+        records[4] = {'type': 'comment', 'post': 100, 'author': 'leo',
+                      'text': 'К несуществующему посту'}
+        path = self.write_jsonl(records)
+        with self.assertRaisesMessage(CommandError, 'Запись 5'):
+            self.import_posts(path, batch_size=2)
+        self.assertEqual(Post.objects.count(), 4)
+        records[4] = {'type': 'comment', 'post': 1, 'author': 'anna',
+                      'text': 'Комментарий'}
+        path = self.write_jsonl(records)
+        self.import_posts(path, batch_size=2)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.get().post.text, 'Пост 1')
+        self.import_posts(path, batch_size=2, restart=True)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(User.objects.get(username='leo').stats.posts_count, 5)
+
+    def test_skip_invalid(self):
+        """С --skip-invalid ошибочные записи пропускаются"""
+        path = self.write_jsonl([
+            {'type': 'post', 'author': 'leo'},
+            {'type': 'unknown'},
+            {'type': 'post', 'author': 'leo', 'text': 'Нормальный пост'},
+        ])
+        self.import_posts(path, skip_invalid=True)
+        self.assertEqual(Post.objects.get().text, 'Нормальный пост')
+
+
+class ExportPostsCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_export_then_import(self):
+        """Выгрузку автора можно загрузить обратно через import_posts"""
+        author = User.objects.create_user(username='leo')
+        group = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов'
+        )
+        post = Post.objects.create(author=author, group=group, text='Кот')
+        Comment.objects.create(post=post, author=author, text='Мяу')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'leo.csv')
+            call_command(
+                'export_posts', author='leo', format='csv', comments=True,
+                output=path,
+            )
+            Post.objects.all().delete()
+            call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual((post.text, post.group, post.author),
+                         ('Кот', group, author))
+        self.assertEqual(post.comments.get().text, 'Мяу')
+
+    def test_export_to_stdout(self):
+        """Без --output выгрузка пишется в stdout"""
+        output = StringIO()
+        call_command('export_posts', all=True, stdout=output)
+        self.assertEqual(output.getvalue(), '')
+        with self.assertRaisesMessage(CommandError, 'Нет автора'):
+            call_command('export_posts', author='nobody')
+
+
+class SyncReplicasCommandTest(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.path = os.path.join(self.tmp, 'replica.sqlite3')
+        databases = dict(connections.databases)
+        databases['replica_test'] = dict(
+            connections.databases['default'], NAME=self.path
+        )
+        patcher = mock.patch.dict(connections.databases, databases)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_copies_primary_into_replica(self):
+        """Файл реплики получает схему и данные основной базы"""
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(author=author, text='Пост для реплики')
+        with override_settings(REPLICA_DATABASES=['replica_test']):
+            call_command('sync_replicas', stdout=StringIO())
+        with closing(sqlite3.connect(self.path)) as replica:
+            rows = replica.execute('SELECT text FROM posts_post').fetchall()
+        self.assertEqual(rows, [('Пост для реплики',)])
+
+    def test_rejects_unknown_alias(self):
+        """Копировать можно только в реплики из настроек"""
+        with override_settings(REPLICA_DATABASES=['replica_test']):
+            with self.assertRaises(CommandError):
+                call_command('sync_replicas', database=['default'])
+        with override_settings(REPLICA_DATABASES=[]):
+            with self.assertRaises(CommandError):
+                call_command('sync_replicas')
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import db
+
+from ..load_benchmark import summarize
+
+
+class SqliteProfileTest(TransactionTestCase):
+    # synchronous нельзя менять внутри транзакции TestCase.
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(DB_PROFILE='production')
+    def test_production_pragmas(self):
+        """Профиль production задаёт ожидание блокировки и кеш"""
+        db.apply_pragmas(connection)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertLess(self.pragma('cache_size'), 0)
+
+    def test_journal_mode_is_not_reset_when_unchanged(self):
+        """Режим журнала меняется, только если он отличается"""
+        current = self.pragma('journal_mode')
+        with mock.patch.object(connection, 'cursor') as cursor:
+            execute = cursor.return_value.__enter__.return_value.execute
+            fetchone = cursor.return_value.__enter__.return_value.fetchone
+            fetchone.return_value = (current.upper(),)
+            db.apply_pragmas(connection, {'journal_mode': current})
+        execute.assert_called_once_with('PRAGMA journal_mode')
+
+
+@override_settings(DB_HEALTH_CHECK_INTERVAL=30)
+class HealthCheckTest(TestCase):
+    def test_idle_broken_connection_is_closed(self):
+        """Простаивавшее соединение, не отвечающее на SELECT 1, закрывается"""
+        connection.ensure_connection()
+        connection.last_used = -100
+        with mock.patch.object(
+            connection, 'cursor', side_effect=DatabaseError
+        ), mock.patch.object(
+            connection, 'in_atomic_block', False
+        ), mock.patch.object(connection, 'close') as close:
+            db.check_connections()
+        close.assert_called_once_with()
+
+    def test_recent_connection_is_not_checked(self):
+        connection.ensure_connection()
+        db.check_connections()
+        with mock.patch.object(connection, 'cursor') as cursor, \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            db.check_connections()
+        cursor.assert_not_called()
+
+
+class LoadBenchmarkSummaryTest(TestCase):
+    def test_summarize(self):
+        """Сводка складывает результаты воркеров"""
+        summary = summarize([
+            {'latencies': {'read': [1, 2, 3], 'write': [10]}, 'errors': {}},
+            {
+                'latencies': {'read': [4], 'write': []},
+                'errors': {'database is locked': 2},
+            },
+        ], duration=2)
+        self.assertEqual(summary['requests_per_s'], 2.5)
+        self.assertEqual(summary['reads_per_s'], 2)
+        self.assertEqual(summary['writes_per_s'], 0.5)
+        self.assertEqual(summary['write_p99_ms'], 10)
+        self.assertEqual(summary['errors'], 2)
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class FeedTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост в группе'
+        )
+        Post.objects.create(author=cls.author, text='Пост без группы')
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SHARED_CACHE=True)
+    def test_feeds_render(self):
+        """Ленты RSS и Atom содержат посты своей области"""
+        cases = (
+            ('posts:index_rss', {}, '<rss', True),
+            ('posts:index_atom', {}, '<feed', True),
+            ('posts:group_rss', {'slug': 'test_slug'}, '<rss', False),
+            ('posts:group_atom', {'slug': 'test_slug'}, '<feed', False),
+            ('posts:profile_rss', {'username': 'Author'}, '<rss', True),
+            ('posts:profile_atom', {'username': 'Author'}, '<feed', True),
+        )
+        for name, kwargs, root, ungrouped in cases:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                self.assertIn(root, content)
+                self.assertIn('Пост в группе', content)
+                self.assertEqual('Пост без группы' in content, ungrouped)
+                self.assertIn('Last-Modified', response)
+
+    def test_missing_group_and_author(self):
+        """Ленты несуществующих группы и автора отдают 404"""
+        for url in (
+            reverse('posts:group_rss', kwargs={'slug': 'missing'}),
+            reverse('posts:profile_atom', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_cached_feed_skips_database(self):
+        """Повторный запрос и условный запрос не обращаются к базе"""
+        url = reverse('posts:group_rss', kwargs={'slug': 'test_slug'})
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_feed_is_invalidated_by_new_post(self):
+        """Новый пост в группе сбрасывает XML ленты группы"""
+        url = reverse('posts:group_atom', kwargs={'slug': 'test_slug'})
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Свежий пост', response.content.decode())
+
+    def test_cache_varies_on_host_and_scheme(self):
+        """Ссылки в закешированном XML ведут на адрес текущего запроса"""
+        url = reverse('posts:index_rss')
+        self.client.get(url)
+        response = self.client.get(url, HTTP_HOST='localhost', secure=True)
+        self.assertIn('https://localhost/', response.content.decode())
+        self.assertNotIn('testserver', response.content.decode())
+
+    def test_query_budget(self):
+        """Генерация ленты укладывается в бюджет запросов"""
+        self.assertWithinQueryBudget('get', reverse('posts:index_rss'))
+        self.assertWithinQueryBudget(
+            'get', reverse('posts:profile_rss', kwargs={'username': 'Author'})
+        )
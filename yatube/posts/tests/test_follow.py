@@ -0,0 +1,199 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import following, timelines
+from ..counters import rebuild_counters
+from ..models import AuthorStats, Follow, Post
+from ..paginators import CursorPaginator
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class FollowViewsTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def follow(self, username, action='profile_follow'):
+        return self.client.post(
+            reverse(f'posts:{action}', kwargs={'username': username})
+        )
+
+    def following_count(self):
+        return AuthorStats.objects.get(user=self.user).following_count
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют связь и счётчик подписок"""
+        response = self.follow('Author')
+        self.assertRedirects(
+            response, reverse('posts:profile', kwargs={'username': 'Author'})
+        )
+        self.follow('Author')
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=self.author).exists()
+        )
+        self.assertEqual(self.following_count(), 1)
+        profile = self.assertWithinQueryBudget(
+            'get', reverse('posts:profile', kwargs={'username': 'Author'})
+        )
+        self.assertTrue(profile.context['following'])
+        self.follow('Author', 'profile_unfollow')
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.following_count(), 0)
+
+    def test_cannot_follow_self_or_by_get(self):
+        self.follow('Reader')
+        self.assertFalse(Follow.objects.exists())
+        response = self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Author'})
+        )
+        self.assertEqual(response.status_code, 405)
+
+    def test_anonymous_redirected(self):
+        client = Client()
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+        client.post(
+            reverse('posts:profile_follow', kwargs={'username': 'Author'})
+        )
+        self.assertFalse(Follow.objects.exists())
+
+    def test_feed_shows_followed_authors_only(self):
+        stranger = User.objects.create_user(username='Stranger')
+        followed = Post.objects.create(author=self.author, text='Подписка')
+        Post.objects.create(author=stranger, text='Чужой пост')
+        url = reverse('posts:follow_index')
+        self.assertEqual(
+            list(self.client.get(url).context['page_obj']), []
+        )
+        self.follow('Author')
+        self.assertEqual(
+            list(self.client.get(url).context['page_obj']), [followed]
+        )
+        fresh = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            list(self.client.get(url).context['page_obj']), [fresh, followed]
+        )
+
+    def test_rebuild_counters(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        AuthorStats.objects.filter(user=self.user).update(following_count=5)
+        rebuild_counters()
+        self.assertEqual(self.following_count(), 1)
+
+
+@override_settings(TIMELINE_SIZE=4, DEFAULT_PAGINATE_BY=3)
+class FollowFeedTests(QueryBudgetMixin, TestCase):
+    """Лента из окон совпадает с лентой из базы на всех страницах"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        now = timezone.now()
+        for number in range(4):
+            author = User.objects.create_user(username=f'author{number}')
+            Follow.objects.create(user=cls.user, author=author)
+            for index in range(number * 2 + 1):
+                Post.objects.create(
+                    author=author,
+                    text=f'Пост {number}-{index}',
+                    pub_date=now - timedelta(minutes=index * 7 + number),
+                )
+        Post.objects.create(
+            author=User.objects.create_user(username='Stranger'), text='Чужой'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def expected(self):
+        return list(following.followed_posts(self.user))
+
+    def walk(self):
+        posts = []
+        cursor = None
+        while True:
+            page = following.get_page(self.user, cursor, 3)
+            posts.extend(page)
+            if not page.has_next():
+                return posts
+            cursor = page.next_cursor
+
+    def test_merged_pages_match_database(self):
+        with mock.patch.object(
+            CursorPaginator, 'page', side_effect=AssertionError
+        ):
+            # Первая страница целиком покрыта окнами авторов.
+            following.get_page(self.user, None, 3)
+        self.assertEqual(self.walk(), self.expected())
+        # Второй проход — из закешированных окон авторов.
+        self.assertEqual(self.walk(), self.expected())
+
+    def test_fanout_pages_match_database(self):
+        with self.settings(FOLLOW_MERGE_MAX_AUTHORS=2):
+            self.assertEqual(self.walk(), self.expected())
+            key = timelines.follow_key(self.user.id)
+            self.assertIsNotNone(cache.get(key))
+            post = Post.objects.create(
+                author=User.objects.get(username='author0'), text='Свежий'
+            )
+            self.assertEqual(cache.get(key)['entries'][0][1], -post.id)
+            self.assertEqual(self.walk(), self.expected())
+
+    def test_author_windows_expire(self):
+        """Окна авторов кешируются на TIMELINE_TIMEOUT, а не навсегда"""
+        with mock.patch.object(
+            cache, 'set_many', wraps=cache.set_many
+        ) as set_many:
+            following.get_page(self.user, None, 3)
+        set_many.assert_called_once()
+        self.assertEqual(set_many.call_args[0][1], settings.TIMELINE_TIMEOUT)
+
+    def test_previous_cursor(self):
+        first = following.get_page(self.user, None, 3)
+        second = following.get_page(self.user, first.next_cursor, 3)
+        back = following.get_page(self.user, second.previous_cursor, 3)
+        self.assertEqual(list(back), list(first))
+
+    def test_recent_posts_per_author(self):
+        authors = User.objects.filter(username__startswith='author')
+        rows = list(following.recent_posts([a.id for a in authors]))
+        for author in authors:
+            with self.subTest(author=author.username):
+                expected = list(
+                    Post.objects.filter(author=author)
+                    .values_list('id', flat=True)[:4]
+                )
+                self.assertEqual(
+                    [post.id for post in rows if post.author_id == author.id],
+                    expected,
+                )
+
+    def test_cursor_is_compatible_with_paginator(self):
+        page = following.get_page(self.user, None, 3)
+        paginator = CursorPaginator(following.followed_posts(self.user), 3)
+        self.assertEqual(
+            list(following.get_page(self.user, page.next_cursor, 3)),
+            list(paginator.get_page(page.next_cursor)),
+        )
+
+    def test_within_budget(self):
+        url = reverse('posts:follow_index')
+        self.assertWithinQueryBudget('get', url)
+        self.assertWithinQueryBudget('get', url)
+        page = self.client.get(url).context['page_obj']
+        self.assertWithinQueryBudget('get', url, {'cursor': page.next_cursor})
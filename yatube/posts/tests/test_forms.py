@@ -1,10 +1,29 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Group, Post
 
 User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(size, image_format='JPEG', exif=None):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', size, 'red')
+    if exif is not None:
+        image.save(buffer, format=image_format, exif=exif)
+    else:
+        image.save(buffer, format=image_format)
+    return buffer.getvalue()
 
 
 class PostCreateFormTests(TestCase):
@@ -76,3 +95,78 @@ class PostCreateFormTests(TestCase):
         }
         for field, expected in context.items():
             self.assertEqual(field, expected)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=400)
+class PostImageFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        return SimpleUploadedFile(name, content, content_type='image/jpeg')
+
+    def test_image_is_downscaled_and_reencoded(self):
+        """Большая картинка уменьшается и сохраняется в WebP без EXIF"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фотографией',
+            'image': self.upload(make_image((1600, 1200), exif=exif)),
+        })
+        post = Post.objects.get(text='Пост с фотографией')
+        self.assertTrue(post.image.name.endswith('.webp'))
+        self.assertEqual((post.image_width, post.image_height), (400, 300))
+        self.assertEqual(post.image_size, post.image.size)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (400, 300))
+            self.assertFalse(image.getexif())
+
+    def test_exif_orientation_is_applied(self):
+        """Поворот из EXIF применяется до удаления метаданных"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        form = PostForm(
+            data={'text': 'Повёрнутое фото'},
+            files={'image': self.upload(make_image((300, 200), exif=exif))},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(
+            (form.instance.image_width, form.instance.image_height),
+            (200, 300),
+        )
+
+    @override_settings(IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с лишними пикселями отклоняется по заголовку"""
+        form = PostForm(
+            data={'text': 'Огромная картинка'},
+            files={'image': self.upload(make_image((200, 200)))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_clearing_image_resets_dimensions(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image='posts/old.jpg',
+            image_width=10, image_height=10, image_size=100,
+        )
+        form = PostForm(
+            data={'text': 'Пост', 'image-clear': 'on'}, instance=post,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image, '')
+        self.assertIsNone(post.image_width)
+        self.assertIsNone(post.image_size)
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import media
+from ..models import Post, User
+from ..storage import is_content_name, post_images
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+GIF = b'GIF89a\x01\x00\x01\x00\x00\x00\x00;'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_RELEASE_GRACE=0)
+# TestCase не выполняет on_commit, поэтому файл освобождается сразу.
+@mock.patch.object(media, 'schedule_release', media.release)
+class ContentAddressedMediaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=GIF, name='meme.gif'):
+        return Post.objects.create(
+            author=self.user, text='Мем',
+            image=ContentFile(content, name=name),
+        )
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковое содержимое сохраняется одним файлом"""
+        first = self.create_post(name='meme.gif')
+        second = self.create_post(name='copy.GIF')
+        other = self.create_post(GIF + b'\x00')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertTrue(first.image.name.endswith('.gif'))
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, только когда на него не ссылается ни один пост"""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_is_released(self):
+        post = self.create_post()
+        path = post.image.path
+        post.image = ContentFile(GIF + b'\x01', name='new.gif')
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    @override_settings(MEDIA_RELEASE_GRACE=600)
+    def test_recent_file_is_kept(self):
+        """Недавно загруженный файл не удаляется сразу"""
+        post = self.create_post()
+        path = post.image.path
+        post.delete()
+        self.assertTrue(os.path.exists(path))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_RELEASE_GRACE=0)
+class DedupeMediaCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def legacy_file(self, name, content):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+        return f'posts/{name}'
+
+    def test_dedupes_in_place(self):
+        """Копии склеиваются в один файл, посты получают новое имя"""
+        user = User.objects.create_user(username='Author')
+        first = Post.objects.create(
+            author=user, text='Первый', image=self.legacy_file('a.gif', GIF)
+        )
+        second = Post.objects.create(
+            author=user, text='Второй', image=self.legacy_file('b.gif', GIF)
+        )
+        orphan = self.legacy_file('orphan.gif', GIF + b'\x02')
+        out = StringIO()
+        call_command('dedupe_media', prune=True, stdout=out)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertTrue(post_images.exists(first.image.name))
+        for name in ('posts/a.gif', 'posts/b.gif', orphan):
+            self.assertFalse(post_images.exists(name))
+        self.assertIn('склеено с копиями: 1', out.getvalue())
+        self.assertIn('Удалено лишних файлов: 1', out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        user = User.objects.create_user(username='Author')
+        name = self.legacy_file('c.gif', GIF)
+        post = Post.objects.create(author=user, text='Пост', image=name)
+        call_command('dedupe_media', dry_run=True, prune=True,
+                     stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+        self.assertTrue(post_images.exists(name))
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Group, Post
 
 User = get_user_model()
 
@@ -34,3 +37,70 @@ class PostModelTest(TestCase):
         self.assertEqual(expected_object_name,
                          str(post),
                          'Метод __str__ в модели Post работает не верно')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, author_posts, group_posts, other_group_posts):
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).posts_count, author_posts
+        )
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(self.other_group.posts_count, other_group_posts)
+
+    def test_post_counters_follow_writes(self):
+        """Счётчики постов меняются при создании, правке и удалении"""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assertCounters(2, 1, 0)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_comment_counters_follow_writes(self):
+        """Счётчик комментариев меняется при создании и удалении"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        Comment.objects.create(post=post, author=self.user, text='Ещё')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики"""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Пост', group=self.group)
+            for _ in range(3)
+        ])
+        post = Post.objects.first()
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.user, text='Комментарий')
+        ])
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(3, 3, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,138 @@
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+
+from django.core import mail as django_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import mail
+from core.models import OutboxMessage
+
+from ..models import User
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('сервер недоступен')
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxBackend',
+    OUTBOX_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OutboxTests(TestCase):
+    def queue(self, count=1):
+        for number in range(count):
+            send_mail(
+                f'Письмо {number}', 'Текст', 'site@yatube.ru',
+                [f'user{number}@yatube.ru'],
+            )
+
+    def test_password_reset_is_queued(self):
+        """Сброс пароля кладёт письмо в очередь, а не отправляет его"""
+        User.objects.create_user(
+            username='Forgetful', email='f@yatube.ru', password='secret-pass'
+        )
+        response = self.client.post(
+            reverse('users:password_reset_form'), {'email': 'f@yatube.ru'}
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(django_mail.outbox, [])
+        outbox = OutboxMessage.objects.get()
+        self.assertEqual(outbox.recipients, 'f@yatube.ru')
+        self.assertEqual(mail.deliver(), {'sent': 1})
+        self.assertEqual(len(django_mail.outbox), 1)
+        self.assertEqual(django_mail.outbox[0].to, ['f@yatube.ru'])
+        self.assertIn('/reset/', django_mail.outbox[0].body)
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, OutboxMessage.SENT)
+        self.assertEqual(mail.deliver(), {})
+
+    def test_serialize_round_trip(self):
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'site@yatube.ru', ['a@yatube.ru'],
+            cc=['b@yatube.ru'], reply_to=['c@yatube.ru'],
+            headers={'X-Kind': 'notify'},
+        )
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('data.bin', b'\x00\x01', 'application/octet-stream')
+        restored = mail.deserialize(mail.serialize(message))
+        for field in ('subject', 'body', 'from_email', 'to', 'cc',
+                      'reply_to', 'extra_headers', 'alternatives',
+                      'attachments'):
+            with self.subTest(field=field):
+                self.assertEqual(
+                    getattr(restored, field), getattr(message, field)
+                )
+
+    @override_settings(
+        OUTBOX_EMAIL_BACKEND='posts.tests.test_outbox.FailingBackend',
+        OUTBOX_MAX_ATTEMPTS=3,
+    )
+    def test_retry_with_backoff(self):
+        """Неудачная отправка откладывается с удвоением паузы"""
+        self.queue()
+        now = timezone.now()
+        self.assertEqual(mail.deliver(now=now), {'retried': 1})
+        outbox = OutboxMessage.objects.get()
+        self.assertEqual(outbox.attempts, 1)
+        self.assertEqual(outbox.next_attempt, now + timedelta(seconds=30))
+        self.assertIn('сервер недоступен', outbox.last_error)
+        self.assertEqual(mail.deliver(now=now + timedelta(seconds=29)), {})
+        later = now + timedelta(seconds=30)
+        self.assertEqual(mail.deliver(now=later), {'retried': 1})
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.next_attempt, later + timedelta(seconds=60))
+        last = later + timedelta(seconds=60)
+        self.assertEqual(mail.deliver(now=last), {'failed': 1})
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, OutboxMessage.FAILED)
+        self.assertEqual(mail.deliver(now=last + timedelta(days=1)), {})
+
+    @override_settings(
+        OUTBOX_EMAIL_BACKEND='posts.tests.test_outbox.CountingBackend'
+    )
+    def test_one_connection_per_batch(self):
+        CountingBackend.opened = 0
+        self.queue(5)
+        self.assertEqual(mail.deliver(batch_size=3), {'sent': 3})
+        self.assertEqual(mail.deliver(batch_size=3), {'sent': 2})
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(len(django_mail.outbox), 5)
+
+    def test_claimed_messages_are_not_taken_twice(self):
+        self.queue(2)
+        now = timezone.now()
+        first = mail.claim(10, now)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(mail.claim(10, now), [])
+        lease_over = now + timedelta(seconds=301)
+        self.assertEqual(len(mail.claim(10, lease_over)), 2)
+
+    def test_send_outbox_command(self):
+        self.queue(3)
+        OutboxMessage.objects.create(
+            recipients='old@yatube.ru', data='{}',
+            status=OutboxMessage.SENT,
+            sent=timezone.now() - timedelta(days=30),
+        )
+        out = StringIO()
+        call_command('send_outbox', batch_size=2, stdout=out)
+        self.assertIn(
+            'Отправлено: 3, отложено: 0, не отправлено: 0, '
+            'удалено старых: 1',
+            out.getvalue(),
+        )
+        self.assertEqual(len(django_mail.outbox), 3)
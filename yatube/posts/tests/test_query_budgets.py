@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Страницы укладываются в бюджет запросов на полной странице данных.
+
+    У каждого поста свои автор и группа, а у комментариев — свои авторы,
+    поэтому обращение к связанным объектам в цикле шаблона сразу
+    превысит бюджет.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        for number in range(12):
+            author = User.objects.create_user(username=f'author{number}')
+            group = Group.objects.create(
+                title=f'Группа {number}',
+                slug=f'group{number}',
+                description='Описание',
+            )
+            post = Post.objects.create(
+                author=author,
+                group=group,
+                text=f'Тестовый пост номер {number}',
+                image=f'posts/budget{number}.gif' if number % 2 else '',
+            )
+        cls.post = post
+        cls.author = author
+        cls.group = group
+        for number in range(6):
+            Comment.objects.create(
+                post=post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text='Комментарий',
+            )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('posts.thumbnails.submit')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def read_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            reverse('posts:search') + '?q=пост',
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_create'),
+        )
+
+    def test_read_pages_within_budget(self):
+        """Страницы укладываются в бюджет без кеша и с кешем"""
+        for client in (Client(), self.authorized_client):
+            self.client = client
+            for url in self.read_urls():
+                for data in ({}, {'cursor': ''}):
+                    with self.subTest(url=url, data=data, client=client):
+                        cache.clear()
+                        self.assertWithinQueryBudget('get', url, data)
+                        self.assertWithinQueryBudget('get', url, data)
+
+    def test_write_views_within_budget(self):
+        """Создание и правка поста и комментарий укладываются в бюджет"""
+        self.client = self.authorized_client
+        self.assertWithinQueryBudget(
+            'post', reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': self.group.id},
+        )
+        self.assertWithinQueryBudget(
+            'post',
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            {'text': 'Исправленный пост', 'group': self.group.id},
+        )
+        self.assertWithinQueryBudget(
+            'post',
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Новый комментарий'},
+        )
+
+    def test_budget_violation_fails(self):
+        """Превышение бюджета роняет тест со списком повторов"""
+        self.client = Client()
+        with self.settings(QUERY_BUDGETS={'posts:index': 0}):
+            with self.assertRaisesMessage(AssertionError, 'при бюджете 0'):
+                self.assertWithinQueryBudget('get', reverse('posts:index'))
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_headers(self):
+        """Middleware отдаёт счётчики запросов в заголовках"""
+        with self.settings(QUERY_BUDGET_HEADERS=True):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response['X-DB-Budget'], '5')
+        self.assertGreaterEqual(int(response['X-DB-Queries']), 1)
+        self.assertIn('X-DB-Time', response)
+        self.assertEqual(response['X-DB-Duplicates'], '0')
+
+    def test_over_budget_is_logged(self):
+        """Превышение бюджета пишется в лог предупреждением"""
+        logger = 'core.middleware.query_budget'
+        with self.settings(QUERY_BUDGETS={'posts:index': 0}):
+            with self.assertLogs(logger, 'WARNING') as logs:
+                self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertEqual(logs.records[0].budget, 0)
+
+    @override_settings(CHANGES_API_TOKEN='secret', CHANGES_BATCH_SIZE=1)
+    def test_streaming_body_is_counted(self):
+        """Запросы при отдаче потокового ответа попадают в учёт"""
+        author = User.objects.create_user(username='Streamer')
+        for number in range(3):
+            Post.objects.create(author=author, text=f'Пост {number}')
+        logger = 'core.middleware.query_budget'
+        with self.settings(QUERY_BUDGETS={'posts:api_changes': 1000},
+                           QUERY_BUDGET_HEADERS=True):
+            response = self.client.get(
+                reverse('posts:api_changes'),
+                HTTP_AUTHORIZATION='Bearer secret',
+            )
+            self.assertNotIn('X-DB-Queries', response)
+            with self.assertLogs(logger, 'DEBUG') as logs:
+                lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 3)
+        # Пачка на каждое событие и последняя, пустая
+        self.assertGreaterEqual(logs.records[0].queries, 4)
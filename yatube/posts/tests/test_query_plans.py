@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from .utils import capture_query_plans, plan_problems
+
+User = get_user_model()
+
+
+class FeedQueryPlanTests(TestCase):
+    """Запросы лент не должны сканировать таблицы и сортировать в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for number in range(25):
+            post = Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+            Comment.objects.create(
+                post=post, author=cls.user, text='Комментарий'
+            )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def assertPlansUseIndexes(self, url, data=None):
+        plans = capture_query_plans(lambda: self.client.get(url, data))
+        self.assertTrue(plans, f'Нет запросов к таблицам постов для {url}')
+        problems = plan_problems(plans)
+        self.assertEqual(
+            problems, [],
+            f'Запросы страницы {url} сканируют таблицу или сортируют '
+            f'во временном B-дереве',
+        )
+
+    def test_feed_query_plans(self):
+        """Ленты и страница поста используют индексы"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            for data in ({}, {'page': 2}, {'cursor': ''}):
+                with self.subTest(url=url, data=data):
+                    self.assertPlansUseIndexes(url, data)
+
+    def test_deep_cursor_pages(self):
+        """Курсорные страницы в глубине ленты используют индексы"""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        ):
+            response = self.client.get(url, {'cursor': ''})
+            cursor = response.context['page_obj'].next_cursor
+            with self.subTest(url=url):
+                self.assertPlansUseIndexes(url, {'cursor': cursor})
+
+    def test_plan_problems_detects_full_scan(self):
+        """Проверка действительно находит полное сканирование"""
+        posts = Post.objects.order_by().filter(text__contains='пост')
+        plans = capture_query_plans(lambda: list(posts))
+        self.assertTrue(plan_problems(plans))
@@ -0,0 +1,159 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware.replica import STICKY_KEY, reads_from_replica
+from core.routers import PrimaryReplicaRouter, replica_reads
+
+from .. import feed_cache, timelines
+from ..models import Group, Post, User
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class PrimaryReplicaRouterTest(TestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self):
+        """Вне страниц лент чтение идёт из основной базы"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_replica_reads(self):
+        """В пределах replica_reads чтение идёт из реплик, запись — нет"""
+        with replica_reads():
+            self.assertIn(
+                self.router.db_for_read(Post), ('replica1', 'replica2')
+            )
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_no_replicas_configured(self):
+        """Без реплик всё читается из основной базы"""
+        with override_settings(REPLICA_DATABASES=[]), replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+class ReplicaRoutingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def request_for(self, url, method='get'):
+        """Запрос со всеми атрибутами, которые выставляет обработчик"""
+        response = getattr(self.client, method)(url)
+        return response.wsgi_request
+
+    def test_feed_pages_read_from_replica(self):
+        """Ленты и страница поста читают из реплик"""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:api_index'),
+        ):
+            with self.subTest(url=url):
+                self.assertTrue(reads_from_replica(self.request_for(url)))
+
+    def test_write_pages_read_from_primary(self):
+        """Формы и изменяющие запросы читают из основной базы"""
+        self.assertFalse(
+            reads_from_replica(self.request_for(reverse('posts:post_create')))
+        )
+        request = self.request_for(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            method='post',
+        )
+        self.assertFalse(reads_from_replica(request))
+
+    def test_post_makes_session_sticky(self):
+        """После записи пользователь какое-то время читает из основной базы"""
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий'},
+        )
+        self.assertGreater(self.client.session[STICKY_KEY], time.time())
+        self.assertFalse(
+            reads_from_replica(self.request_for(reverse('posts:index')))
+        )
+
+    def test_sticky_window_expires(self):
+        session = self.client.session
+        session[STICKY_KEY] = time.time() - 1
+        session.save()
+        self.assertTrue(
+            reads_from_replica(self.request_for(reverse('posts:index')))
+        )
+
+
+# Реплика — та же тестовая база: важно только, куда направил чтение роутер.
+@override_settings(REPLICA_DATABASES=['default'])
+class ReplicaCacheFillTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch(
+            'core.routers.random.choice', side_effect=lambda aliases: 'default'
+        )
+        self.choice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timeline_loaded_from_primary(self):
+        """Окно ленты для кеша читается из основной базы"""
+        with replica_reads():
+            timelines.load(timelines.GLOBAL_KEY, Post.objects.all())
+        self.choice.assert_not_called()
+        self.assertEqual(
+            cache.get(timelines.GLOBAL_KEY)['entries'],
+            [timelines.entry(self.post.pub_date, self.post.id)],
+        )
+
+    def test_fragment_not_cached_from_replica(self):
+        """Ленту из реплики не кешируют и не отдают с валидаторами"""
+        with mock.patch(
+            'core.templatetags.feed_cache.feed_cache.record'
+        ) as record:
+            for _ in range(2):
+                response = self.client.get(reverse('posts:index'))
+                self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(
+            [call for call in record.call_args_list if call[0] == ('global',)],
+            [mock.call('global', hit=False)] * 2,
+        )
+        self.choice.assert_called()
+
+    @override_settings(SHARED_CACHE=True)
+    def test_validators_after_replica_lag(self):
+        """Страница из реплики получает валидаторы, когда реплика догнала"""
+        url = reverse('posts:index')
+        self.assertFalse(self.client.get(url).has_header('ETag'))
+        self.choice.assert_called()
+        with mock.patch('posts.feed_cache._now',
+                        return_value=feed_cache._now() + 60 * 1000):
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('ETag'))
+            with override_settings(REPLICA_MAX_LAG=None):
+                response = self.client.get(url)
+                self.assertFalse(response.has_header('ETag'))
+
+    @override_settings(SHARED_CACHE=True)
+    def test_feed_built_from_primary(self):
+        """XML ленты для кеша строится по основной базе"""
+        response = self.client.get(reverse('posts:index_rss'))
+        self.assertContains(response, 'Пост')
+        self.assertTrue(response.has_header('ETag'))
+        self.choice.assert_not_called()
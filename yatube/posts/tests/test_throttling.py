@@ -0,0 +1,160 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from core import throttling
+from core.middleware import admission
+from core.middleware.admission import WriteAdmissionMiddleware, stats
+
+from ..models import Comment, Post, User
+
+
+class SlidingWindowTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/m'), (10, 60))
+        self.assertEqual(throttling.parse_rate('2/s'), (2, 1))
+
+    def test_limit_over_sliding_window(self):
+        """За любой период проходит не больше N запросов"""
+        take = throttling.take
+        self.assertEqual(take('client', 2, 60, now=600), (True, 0))
+        self.assertEqual(take('client', 2, 60, now=600), (True, 0))
+        # Текущее окно заполнено: ждать, пока оно уйдёт в прошлое на 3/4.
+        self.assertEqual(take('client', 2, 60, now=600), (False, 90))
+        # В начале следующего окна прошлое ещё считается целиком.
+        self.assertEqual(take('client', 2, 60, now=660), (False, 30))
+        self.assertEqual(take('client', 2, 60, now=690), (True, 0))
+        self.assertEqual(take('client', 2, 60, now=690)[0], False)
+
+    def test_rejected_requests_are_not_counted(self):
+        for _ in range(5):
+            throttling.take('client', 1, 60, now=600)
+        self.assertEqual(cache.get('client:10'), 1)
+
+
+@override_settings(THROTTLE_RATES={'posts:add_comment': '2/m'})
+class ThrottleMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Spammer')
+        cls.other = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.id}
+        )
+        # Начало минутного окна.
+        patcher = mock.patch('core.throttling.time.time', return_value=600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def comment(self, client):
+        return client.post(self.url, {'text': 'Комментарий'})
+
+    def test_user_over_rate_gets_429(self):
+        """Сверх ставки комментарий не сохраняется, ответ 429"""
+        client = Client()
+        client.force_login(self.user)
+        for _ in range(2):
+            self.assertEqual(self.comment(client).status_code, 302)
+        response = self.comment(client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '90')
+        self.assertEqual(Comment.objects.count(), 2)
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.assertEqual(client.get(detail).status_code, 200)
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(self.comment(other).status_code, 302)
+        self.assertEqual(
+            stats()['posts:add_comment'], {'allowed': 3, 'throttled': 1}
+        )
+
+    def test_anonymous_limited_by_ip(self):
+        first = Client(REMOTE_ADDR='10.0.0.1')
+        for _ in range(2):
+            self.assertEqual(self.comment(first).status_code, 302)
+        self.assertEqual(self.comment(first).status_code, 429)
+        second = Client(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.comment(second).status_code, 302)
+
+    def test_stats_command(self):
+        client = Client()
+        client.force_login(self.user)
+        for _ in range(3):
+            self.comment(client)
+        out = StringIO()
+        call_command('throttle_stats', stdout=out)
+        self.assertIn(
+            'posts:add_comment: allowed=2 throttled=1 rejected=33.33%',
+            out.getvalue(),
+        )
+
+
+@override_settings(WRITE_CONCURRENCY=1, WRITE_QUEUE_TIMEOUT=0)
+class WriteAdmissionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.middleware = WriteAdmissionMiddleware(
+            lambda request: HttpResponse()
+        )
+
+    def request(self, method='post'):
+        url = reverse('posts:post_create')
+        request = getattr(RequestFactory(), method)(url)
+        request.resolver_match = resolve(url)
+        request.user = User(username='Writer', pk=1)
+        return request
+
+    def admit(self, request):
+        return self.middleware.process_view(request, None, (), {})
+
+    def test_sheds_when_slots_busy(self):
+        """Пока место занято, следующая запись сразу получает 503"""
+        busy = self.request()
+        self.assertIsNone(self.admit(busy))
+        response = self.admit(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertIsNone(self.admit(self.request('get')))
+        # Место освобождается после ответа на первый запрос.
+        self.middleware(busy)
+        self.assertIsNone(self.admit(self.request()))
+        self.assertEqual(
+            stats()['admission'], {'admitted': 2, 'queued': 1, 'shed': 1}
+        )
+
+    def test_slot_is_leased(self):
+        """Место берётся в общем кеше на срок и не держится вечно"""
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.assertIsNone(self.admit(self.request()))
+        add.assert_any_call(
+            admission.SLOT_KEY.format(0), mock.ANY, settings.WRITE_SLOT_LEASE
+        )
+        # Срок места истёк, и его занял другой запрос.
+        cache.delete(admission.SLOT_KEY.format(0))
+        other = self.request()
+        self.assertIsNone(self.admit(other))
+        admission.release(admission.SLOT_KEY.format(0), 'expired')
+        self.assertEqual(self.admit(self.request()).status_code, 503)
+        self.middleware(other)
+        self.assertIsNone(self.admit(self.request()))
+
+    def test_disabled(self):
+        middleware = WriteAdmissionMiddleware(lambda r: HttpResponse())
+        with self.settings(WRITE_CONCURRENCY=0):
+            for _ in range(3):
+                self.assertIsNone(
+                    middleware.process_view(self.request(), None, (), {})
+                )
@@ -1,5 +1,9 @@
+import csv
+import io
+import json
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -8,8 +12,15 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from sorl.thumbnail.images import serialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .. import feed_cache, thumbnails, timelines
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -60,6 +71,10 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
+        submit_patcher = mock.patch('posts.thumbnails.submit')
+        self.submit = submit_patcher.start()
+        self.addCleanup(submit_patcher.stop)
         self.user = User.objects.get(username='Author')
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -121,6 +136,49 @@ class PostPagesTests(TestCase):
         )
         self.assertEqual(len(response.context['page_obj']), 10)
 
+    def test_cursor_pagination(self):
+        """Курсорная паджинация отдаёт страницы без COUNT(*) и OFFSET"""
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url, {'cursor': ''})
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+        response = self.authorized_client.get(
+            url, {'cursor': first_page.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [post.id for post in list(first_page) + list(second_page)],
+            list(Post.objects.values_list('id', flat=True)),
+        )
+        response = self.authorized_client.get(
+            url, {'cursor': second_page.previous_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page)
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+        # Ключ фрагмента страницы зависит от курсора запроса.
+        self.assertNotEqual(
+            repr(response.context['page_obj']), repr(first_page)
+        )
+
+    def test_cursor_pagination_invalid_cursor(self):
+        """Некорректный курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            {'cursor': 'not-a-cursor'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
     def test_post_detail_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
         response = (self.authorized_client.get(
@@ -175,9 +233,69 @@ class PostPagesTests(TestCase):
         self.assertEqual(len(response.context['page_obj']), 0)
 
     def test_picture_uploaded(self):
-        """Пост с картинкой создаётся"""
-        post = Post.objects.last()
-        self.assertEqual(post.image.name, 'posts/small.gif')
+        """Одинаковые картинки постов хранятся одним файлом"""
+        names = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        self.assertEqual(len(names), 1)
+        self.assertRegex(
+            names.pop(), r'^posts/[0-9a-f]{2}/[0-9a-f]{62}\.gif$'
+        )
+
+    def test_thumbnail_is_not_rendered_in_request(self):
+        """Без готовой миниатюры страница отдаёт заглушку"""
+        post = Post.objects.first()
+        post_url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            response = self.authorized_client.get(post_url)
+        get_thumbnail.assert_not_called()
+        self.submit.assert_called_once_with(post.image.name)
+        self.assertContains(response, 'img/placeholder.png')
+        # Место под картинку известно до загрузки: и заглушка, и миниатюра
+        # обрезаны до одного размера
+        self.assertContains(response, 'width="960" height="339"')
+        ready = mock.Mock(url='/media/cache/ready.gif')
+        with mock.patch('posts.thumbnails.cached_thumbnail',
+                        return_value=ready):
+            response = self.authorized_client.get(post_url)
+        self.assertContains(response, '/media/cache/ready.gif')
+
+    def test_thumbnails_are_prefetched_per_page(self):
+        """Миниатюры страницы ищутся одним запросом к хранилищу sorl"""
+        thumbnails.ready_thumbnails.clear()
+        post = Post.objects.first()
+        thumbnail = thumbnails.thumbnail_file(
+            post.image, '960x339', crop='center', upscale=True
+        )
+        thumbnail.set_size((960, 339))
+        KVStore.objects.create(
+            key=add_prefix(thumbnail.key),
+            value=serialize_image_file(thumbnail),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        # У всех постов одна и та же картинка, а значит и миниатюра.
+        self.assertContains(response, thumbnail.url, count=10)
+        self.assertNotContains(response, 'img/placeholder.png')
+        self.assertIsNotNone(thumbnails.ready_thumbnails.get(thumbnail.key))
+
+    def test_thumbnails_prefetched_only_for_rendered_blocks(self):
+        """Страница из кеша фрагментов не ищет миниатюры"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with mock.patch('posts.thumbnails.prefetch') as prefetch, \
+                CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        prefetch.assert_not_called()
+        self.assertFalse(any(
+            'thumbnail_kvstore' in query['sql']
+            for query in queries.captured_queries
+        ))
 
     def test_add_comment(self):
         """Авторизированный пользователь создаёт комментарий"""
@@ -202,11 +320,62 @@ class PostPagesTests(TestCase):
         )
         self.assertEqual(len(response1.context['comments']), 1)
 
+    @override_settings(COMMENTS_PAGINATE_BY=3)
+    def test_comments_are_paged(self):
+        """Комментарии отдаются порциями по порядку и без N+1"""
+        post = Post.objects.first()
+        authors = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)
+        ]
+        Comment.objects.bulk_create([
+            Comment(post=post, author=author, text=f'Комментарий {number}')
+            for number, author in enumerate(authors + authors)
+        ])
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        comment_queries = [
+            query for query in queries.captured_queries
+            if 'posts_comment' in query['sql']
+        ]
+        self.assertEqual(len(comment_queries), 1)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'],
+        )
+        url = reverse('posts:post_comments', kwargs={'post_id': post.id})
+        # Без скрипта ссылка «Показать ещё» открывает всю страницу записи
+        response = self.authorized_client.get(
+            url, {'cursor': comments.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 3', 'Комментарий 4', 'Комментарий 5'],
+        )
+        self.assertIn('X-Requested-With', response['Vary'])
+        texts = []
+        while comments.has_next():
+            response = self.authorized_client.get(
+                url, {'cursor': comments.next_cursor},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+            self.assertNotContains(response, '<form')
+            comments = response.context['comments']
+            texts += [comment.text for comment in comments]
+        self.assertEqual(
+            texts, [f'Комментарий {number}' for number in range(3, 8)]
+        )
+
     def test_cache_index(self):
         """Проверяем работу кеша главной страницы"""
         response = self.authorized_client.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(text='test cashe', author=self.user)
+        Post.objects.filter(pk=Post.objects.first().pk).update(
+            text='изменено в обход сигналов'
+        )
         response_old = self.authorized_client.get(reverse('posts:index'))
         old_posts = response_old.content
         self.assertEqual(old_posts, posts)
@@ -214,3 +383,458 @@ class PostPagesTests(TestCase):
         response_new = self.authorized_client.get(reverse('posts:index'))
         posts_new = response_new.content
         self.assertNotEqual(old_posts, posts_new)
+
+    def test_cache_is_invalidated_by_signals(self):
+        """Новый пост сразу виден в своих лентах, чужие кеши не сброшены"""
+        index_url = reverse('posts:index')
+        other_group_url = reverse(
+            'posts:group_list', kwargs={'slug': 'test_slug_2'}
+        )
+        self.authorized_client.get(index_url)
+        other_group_page = self.authorized_client.get(other_group_url).content
+        Post.objects.create(text='test cashe', author=self.user)
+        self.assertContains(
+            self.authorized_client.get(index_url), 'test cashe'
+        )
+        with mock.patch(
+            'core.templatetags.feed_cache.feed_cache.record'
+        ) as record:
+            response = self.authorized_client.get(other_group_url)
+        other_group = Group.objects.get(slug='test_slug_2')
+        record.assert_called_once_with(f'group:{other_group.id}', hit=True)
+        self.assertEqual(response.content, other_group_page)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_conditional_get(self):
+        """Анонимный клиент получает 304, пока лента не изменилась"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        etags = {}
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = etags[url] = response['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 304)
+        Post.objects.create(
+            text='Новый пост', author=self.user,
+            group=Group.objects.get(slug='test_slug'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_post_detail_conditional_get(self):
+        """Страница поста отдаёт 304, пока не изменились пост и автор"""
+        post = Post.objects.first()
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Новый пост автора меняет счётчик на странице
+        Post.objects.create(text='Ещё пост', author=post.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Comment.objects.create(post=post, author=self.user, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_author_rename_invalidates_profile(self):
+        """Смена имени автора сбрасывает профиль и старый адрес"""
+        old_url = reverse('posts:profile', kwargs={'username': 'Author'})
+        etag = self.client.get(old_url)['ETag']
+        user = User.objects.get(username='Author')
+        user.first_name = 'Лев'
+        user.save()
+        response = self.client.get(old_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Лев')
+        user.username = 'Renamed'
+        user.save()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertIsNone(
+            feed_cache.author_namespace_by_username('Author')
+        )
+
+    @override_settings(SHARED_CACHE=True)
+    def test_commenter_rename_invalidates_post(self):
+        """Смена имени комментатора сбрасывает страницу поста без запросов"""
+        post = Post.objects.first()
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            feed_cache.bump_user(self.user.id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_last_login_does_not_invalidate_profile(self):
+        """Запись времени входа не сбрасывает профиль"""
+        url = reverse('posts:profile', kwargs={'username': 'Author'})
+        etag = self.client.get(url)['ETag']
+        Client().force_login(User.objects.get(username='Author'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_conditional_get_skipped_for_users(self):
+        """Для авторизованных пользователей валидаторы не выдаются"""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_conditional_get_needs_shared_cache(self):
+        """Без общего кеша версии у процессов свои и валидаторов нет"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class TimelineCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+        for number in range(12):
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+
+    def page_ids(self, page=1):
+        response = self.client.get(self.url, {'page': page})
+        return [post.id for post in response.context['page_obj']]
+
+    def test_page_is_hydrated_from_timeline(self):
+        """Страница ленты из кеша собирается одним запросом id__in"""
+        self.page_ids()
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.page_ids()
+        post_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn(' IN (', post_queries[0])
+        self.assertEqual(
+            ids, list(self.group.posts.values_list('id', flat=True)[:10])
+        )
+
+    def test_timeline_follows_writes(self):
+        """Лента в кеше обновляется при создании, правке и удалении"""
+        self.page_ids()
+        new_post = Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        self.assertEqual(self.page_ids()[0], new_post.id)
+        new_post.group = self.other_group
+        new_post.save()
+        self.assertNotIn(new_post.id, self.page_ids())
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'other_slug'})
+        )
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        last_post = self.group.posts.last()
+        last_post.delete()
+        self.assertNotIn(last_post.id, self.page_ids(2))
+        self.assertEqual(len(self.page_ids(2)), 1)
+
+    @override_settings(TIMELINE_SIZE=5)
+    def test_count_cached_next_to_window(self):
+        """Число постов неполного окна не пересчитывается на каждой странице"""
+        self.page_ids()
+        with CaptureQueriesContext(connection) as queries:
+            self.page_ids(2)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+    @override_settings(TIMELINE_SIZE=10)
+    def test_pages_past_window_use_cursor(self):
+        """За окном кеша лента листается курсором, без OFFSET и COUNT"""
+        response = self.client.get(self.url)
+        page_obj = response.context['page_obj']
+        self.assertIsNotNone(page_obj.next_cursor)
+        self.assertContains(response, f'cursor={page_obj.next_cursor}')
+        self.assertNotContains(response, 'page=2')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url, {'cursor': page_obj.next_cursor}
+            )
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] or 'OFFSET' in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            list(self.group.posts.values_list('id', flat=True)[10:]),
+        )
+
+    def test_window_expires(self):
+        """Окно живёт не дольше TIMELINE_TIMEOUT с момента загрузки"""
+        self.page_ids()
+        key = timelines.group_key(self.group.id)
+        timeline = cache.get(key)
+        timeline['loaded'] -= settings.TIMELINE_TIMEOUT
+        timelines.store(key, timeline)
+        self.assertIsNone(cache.get(key))
+
+    def test_busy_window_is_dropped(self):
+        """Окно, которое меняет другой процесс, сбрасывается"""
+        self.page_ids()
+        key = timelines.group_key(self.group.id)
+        cache.add(f'{key}:lock', 1)
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        self.assertIsNone(cache.get(key))
+
+
+class PostBlockCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        for number in range(3):
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def block_stats(self):
+        return feed_cache.stats()['block']
+
+    def test_blocks_survive_page_invalidation(self):
+        """После сброса страницы блоки неизменённых постов берутся из кеша"""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.block_stats(), {'hits': 0, 'misses': 3})
+        post = Post.objects.first()
+        post.text = 'Исправленный пост'
+        post.save()
+        with mock.patch(
+            'core.templatetags.feed_cache.cache.get_many',
+            wraps=cache.get_many,
+        ) as get_many:
+            response = self.client.get(reverse('posts:index'))
+        block_reads = [
+            keys for (keys,), _ in get_many.call_args_list
+            if keys[0].startswith('feed_cache:block:')
+        ]
+        self.assertEqual(len(block_reads), 1)
+        self.assertContains(response, 'Исправленный пост')
+        self.assertEqual(self.block_stats(), {'hits': 2, 'misses': 4})
+
+    def test_author_change_rerenders_block(self):
+        """Смена имени автора сбрасывает ленту и ключ блока без правки поста"""
+        self.client.get(reverse('posts:index'))
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Николай'
+        user.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Николай Толстой', count=3)
+
+    def test_group_rename_rerenders_feeds(self):
+        """Смена slug группы сбрасывает ленты с постами группы"""
+        profile_url = reverse('posts:profile', kwargs={'username': 'Author'})
+        self.client.get(reverse('posts:index'))
+        self.client.get(profile_url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed_slug'
+        group.save()
+        new_url = reverse('posts:group_list', kwargs={'slug': 'renamed_slug'})
+        for url in (reverse('posts:index'), profile_url):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), new_url, count=3)
+
+    def test_blocks_differ_per_feed(self):
+        """Лента группы и общая лента кешируют разную разметку поста"""
+        post = Post.objects.first()
+        detail_url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            detail_url)
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+        )
+        self.assertNotContains(response, detail_url)
+        self.assertContains(response, '<hr>', count=2)
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Author', is_staff=True,
+                                            is_superuser=True)
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Котики и кошки: котики лучше всех'
+        )
+        cls.cat = Post.objects.create(
+            author=cls.user, text='Один котик спит на кошке'
+        )
+        cls.dogs = Post.objects.create(author=cls.user, text='Про собак')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_uses_stems_and_ranks(self):
+        """Поиск находит словоформы и ранжирует по числу совпадений"""
+        self.assertEqual(self.search('котиков'), [self.cats, self.cat])
+        self.assertEqual(self.search('котик кошка'), [self.cats, self.cat])
+        self.assertEqual(self.search('собака'), [self.dogs])
+
+    def test_search_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста"""
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Теперь про котиков'
+        dogs.save()
+        self.assertIn(dogs, self.search('котик'))
+        self.assertEqual(self.search('собака'), [])
+        Post.objects.get(pk=self.cat.pk).delete()
+        self.assertNotIn(self.cat, self.search('котик'))
+
+    def test_empty_query(self):
+        """Пустой запрос не выполняет поиск"""
+        response = self.client.get(reverse('posts:search'), {'q': ' и '})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_cursor_param_ignored(self):
+        """Параметр cursor не ломает постраничную выдачу поиска"""
+        for cursor in ('', 'garbage'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': 'котик', 'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    list(response.context['page_obj']), [self.cats, self.cat]
+                )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке требует совпадения всех слов запроса"""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик кошки'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.cats, self.cat}
+        )
+
+
+class ExportViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.moderator = User.objects.create_user(
+            username='Moderator', is_staff=True
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        for number in range(5):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            Comment.objects.create(
+                post=post, author=cls.other, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def export(self, user, url, **params):
+        self.client.force_login(user)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_profile_export_jsonl(self):
+        """Автор выгружает свои посты с комментариями потоком"""
+        url = reverse('posts:profile_export', kwargs={'username': 'Author'})
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            content = self.export(self.author, url, comments=1)
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(records[0]['type'], 'group')
+        self.assertEqual(
+            [record['text'] for record in records
+             if record['type'] == 'post'],
+            [f'Пост {number}' for number in range(5)],
+        )
+        self.assertEqual(
+            sum(record['type'] == 'comment' for record in records), 5
+        )
+        post_ids = set()
+        for record in records:
+            if record['type'] == 'post':
+                post_ids.add(record['id'])
+            elif record['type'] == 'comment':
+                self.assertIn(record['post'], post_ids)
+
+    def test_group_export_csv(self):
+        """Модератор выгружает группу в CSV"""
+        url = reverse('posts:group_export', kwargs={'slug': 'test_slug'})
+        content = self.export(self.moderator, url, format='csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1]['author'], 'Author')
+        self.assertEqual(rows[1]['group'], 'test_slug')
+
+    def test_export_permissions(self):
+        """Чужой профиль и группу выгрузить нельзя"""
+        self.client.force_login(self.other)
+        for url in (
+            reverse('posts:profile_export', kwargs={'username': 'Author'}),
+            reverse('posts:group_export', kwargs={'slug': 'test_slug'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        response = self.client.get(
+            reverse('posts:profile_export', kwargs={'username': 'Author'})
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_queries_do_not_grow_per_post(self):
+        """Число запросов зависит от числа пачек, а не постов"""
+        url = reverse('posts:profile_export', kwargs={'username': 'Author'})
+        self.client.force_login(self.author)
+        with override_settings(EXPORT_CHUNK_SIZE=5):
+            response = self.client.get(url, {'comments': 1, 'images': 1})
+            with CaptureQueriesContext(connection) as queries:
+                b''.join(response.streaming_content)
+        # Группы, посты и комментарии единственной пачки.
+        self.assertEqual(len(queries), 3)
@@ -0,0 +1,86 @@
+import re
+from collections import Counter
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware.query_budget import (
+    fingerprint, get_budget, is_transaction_control
+)
+
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)\b(?! USING)')
+TEMP_BTREE = 'USE TEMP B-TREE'
+
+
+def explain(sql):
+    """Строки `EXPLAIN QUERY PLAN` для запроса SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def capture_query_plans(func, tables=('posts_',)):
+    """Выполняет func и возвращает планы SELECT-запросов к таблицам.
+
+    Результат — список пар (sql, строки плана) только для запросов,
+    которые обращаются к таблицам с указанными префиксами.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    plans = []
+    for query in queries.captured_queries:
+        sql = query['sql']
+        if not sql.startswith('SELECT'):
+            continue
+        if not any(f'"{prefix}' in sql for prefix in tables):
+            continue
+        plans.append((sql, explain(sql)))
+    return plans
+
+
+def plan_problems(plans, tables=('posts_',)):
+    """Полные сканирования таблиц и сортировки во временном B-дереве."""
+    problems = []
+    for sql, plan in plans:
+        for detail in plan:
+            match = FULL_SCAN_RE.match(detail)
+            if match and match.group('table').startswith(tables):
+                problems.append((detail, sql))
+            elif TEMP_BTREE in detail:
+                problems.append((detail, sql))
+    return problems
+
+
+class QueryBudgetMixin:
+    """Проверка числа SQL-запросов страницы по бюджету `QUERY_BUDGETS`.
+
+    Тело потокового ответа читается внутри проверки: его запросы тоже
+    входят в бюджет.
+    """
+
+    def assertWithinQueryBudget(self, method, url, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **extra)
+            if response.streaming:
+                response.streaming_content = [
+                    b''.join(response.streaming_content)
+                ]
+        name = response.resolver_match.view_name
+        budget = get_budget(name)
+        self.assertIsNotNone(budget, f'Для {name} не задан бюджет запросов')
+        sqls = [
+            query['sql'] for query in queries.captured_queries
+            if not is_transaction_control(query['sql'])
+        ]
+        if len(sqls) > budget:
+            repeated = [
+                f'{count} x {sql}'
+                for sql, count in Counter(map(fingerprint, sqls)).items()
+                if count > 1
+            ]
+            self.fail(
+                f'{method.upper()} {url} ({name}): {len(sqls)} запросов '
+                f'при бюджете {budget}.\nПовторы:\n' + '\n'.join(repeated)
+                + '\nВсе запросы:\n' + '\n'.join(sqls)
+            )
+        return response
@@ -0,0 +1,190 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Шаблоны не создают миниатюры во время запроса: они берут готовую запись
+из key-value хранилища sorl-thumbnail, а если её ещё нет — показывают
+заглушку и ставят картинку в очередь. Миниатюры создаёт пул потоков после
+коммита транзакции, в которой сохранён пост.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from . import changes, feed_cache, sorl_adapter
+from .models import ChangeEvent, Post
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+# Размеры миниатюр, которые используются в шаблонах постов.
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def thumbnail_file(file_, geometry_string, **options):
+    """ImageFile миниатюры без её создания."""
+    name = sorl_adapter.thumbnail_name(
+        ImageFile(file_), geometry_string, options
+    )
+    return ImageFile(name, default.storage)
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кеш ограниченного размера."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Готовые миниатюры не меняются, поэтому их можно держать в памяти
+# процесса. Отсутствующие не кешируются: они появятся после генерации.
+ready_thumbnails = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+
+
+def prefetch(posts):
+    """Находит миниатюры для картинок постов за один проход.
+
+    Результат сохраняется на самих `FieldFile`, так что тег
+    `thumbnail_url` при отрисовке этих постов в хранилище уже не ходит.
+    Вызывается тегом `postblocks` только для постов, блоки которых
+    отрисовываются заново.
+    """
+    pending = {}
+    for post in posts:
+        if not post.image:
+            continue
+        found = getattr(post.image, 'prefetched_thumbnails', None)
+        if found is None:
+            found = post.image.prefetched_thumbnails = {}
+        for geometry_string, options in POST_THUMBNAILS:
+            key = thumbnail_file(post.image, geometry_string, **options).key
+            thumbnail = ready_thumbnails.get(key)
+            found[key] = thumbnail
+            if thumbnail is None:
+                pending.setdefault(key, []).append(found)
+    if not pending:
+        return
+    for key, thumbnail in sorl_adapter.get_many(list(pending)).items():
+        ready_thumbnails.set(key, thumbnail)
+        for found in pending[key]:
+            found[key] = thumbnail
+
+
+def cached_thumbnail(file_, geometry_string, **options):
+    """Готовая миниатюра из хранилища sorl или None."""
+    key = thumbnail_file(file_, geometry_string, **options).key
+    prefetched = getattr(file_, 'prefetched_thumbnails', {})
+    if key in prefetched:
+        return prefetched[key]
+    thumbnail = ready_thumbnails.get(key)
+    if thumbnail is None:
+        thumbnail = sorl_adapter.get(key)
+        if thumbnail is not None:
+            ready_thumbnails.set(key, thumbnail)
+    return thumbnail
+
+
+def generate(name):
+    """Создаёт недостающие миниатюры картинки и сбрасывает кеш лент с ней.
+
+    Если все миниатюры уже есть в хранилище sorl, посты не меняются:
+    повторный прогон `generate_thumbnails` не трогает ни `updated_at`,
+    ни журнал изменений, ни кеш лент.
+    """
+    source = ImageFile(name, post_images)
+    sizes = {
+        thumbnail_file(source, geometry_string, **options).key:
+            (geometry_string, options)
+        for geometry_string, options in POST_THUMBNAILS
+    }
+    ready = sorl_adapter.get_many(list(sizes))
+    missing = [size for key, size in sizes.items() if key not in ready]
+    if not missing:
+        return
+    try:
+        for geometry_string, options in missing:
+            get_thumbnail(source, geometry_string, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру для %s', name)
+        return
+    posts = Post.objects.filter(image=name)
+    with transaction.atomic():
+        # Блоки постов в лентах показывают заглушку, пока миниатюры нет.
+        posts.update(updated_at=timezone.now())
+        changed = list(posts)
+        changes.record_many(changed, ChangeEvent.UPDATE)
+    feed_cache.bump_posts(
+        (post.id, post.author_id, post.group_id) for post in changed
+    )
+
+
+def _work(name):
+    try:
+        generate(name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+        connection.close()
+
+
+def submit(name):
+    """Отдаёт картинку пулу потоков, если она ещё не в очереди.
+
+    При `THUMBNAIL_WORKERS = 0` миниатюры создаются сразу.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return None
+    with _pending_lock:
+        if name in _pending:
+            return None
+        _pending.add(name)
+    return get_executor().submit(_work, name)
+
+
+def schedule(post):
+    """Ставит миниатюры поста в очередь после коммита транзакции."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: submit(name))
@@ -0,0 +1,209 @@
+"""Кеш лент: ограниченные списки id последних постов.
+
+Для общей ленты, каждой группы и каждого автора, а также для ленты
+подписок тех, кто читает много авторов, в кеше хранится окно из
+`TIMELINE_SIZE` последних записей в порядке `Post.Meta.ordering`. Окно
+обновляется сигналами при сохранении и удалении поста, а страницы за его
+пределами читаются из базы как раньше.
+
+Сигналы меняют окно под блокировкой `cache.add`, а если её держит другой
+процесс, просто сбрасывают окно. Окно живёт не дольше `TIMELINE_TIMEOUT`
+секунд с момента загрузки из базы, поэтому расхождение, пропущенное
+сигналами, со временем исправляется само.
+"""
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import primary_reads
+
+GLOBAL_KEY = 'timeline:global'
+LOCK_TIMEOUT = 5
+
+
+def group_key(group_id):
+    return f'timeline:group:{group_id}'
+
+
+def author_key(author_id):
+    return f'timeline:author:{author_id}'
+
+
+def follow_key(user_id):
+    return f'timeline:follow:{user_id}'
+
+
+def count_key(key):
+    return f'{key}:count'
+
+
+def post_keys(author_id, group_id):
+    """Ключи всех лент, в которые попадает пост."""
+    keys = [GLOBAL_KEY, author_key(author_id)]
+    if group_id is not None:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def entry(pub_date, post_id):
+    # Отрицательные значения дают возрастающий порядок для bisect.
+    return (-pub_date.timestamp(), -post_id)
+
+
+def build(rows):
+    """Окно ленты из пар (pub_date, id) в порядке ленты."""
+    size = settings.TIMELINE_SIZE
+    timeline = {
+        'entries': [
+            entry(pub_date, post_id) for pub_date, post_id in rows[:size]
+        ],
+    }
+    timeline['complete'] = len(timeline['entries']) < size
+    timeline['loaded'] = time.time()
+    return timeline
+
+
+def store(key, timeline):
+    """Кладёт окно в кеш до истечения срока, отсчитанного от загрузки."""
+    timeout = timeline['loaded'] + settings.TIMELINE_TIMEOUT - time.time()
+    if timeout > 0:
+        cache.set(key, timeline, timeout)
+    else:
+        cache.delete(key)
+
+
+def load(key, queryset):
+    """Загружает окно ленты из основной базы и кладёт его в кеш."""
+    rows = queryset.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id'
+    )[:settings.TIMELINE_SIZE]
+    with primary_reads():
+        timeline = build(list(rows))
+    store(key, timeline)
+    return timeline
+
+
+def get(key, queryset):
+    timeline = cache.get(key)
+    if timeline is None:
+        timeline = load(key, queryset)
+    return timeline
+
+
+def change(keys, func):
+    """Применяет `func` к закешированным окнам лент.
+
+    `func` получает окно и возвращает изменённое или None, если окно
+    надо сбросить. Число постов лент пересчитывается заново.
+    """
+    cache.delete_many([count_key(key) for key in keys])
+    for key in keys:
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, LOCK_TIMEOUT):
+            cache.delete(key)
+            continue
+        try:
+            timeline = cache.get(key)
+            if timeline is None:
+                continue
+            timeline = func(timeline)
+            if timeline is None:
+                cache.delete(key)
+            else:
+                store(key, timeline)
+        finally:
+            cache.delete(lock)
+
+
+def add_post(post, keys):
+    """Вставляет пост в уже закешированные ленты."""
+    new = entry(post.pub_date, post.id)
+    size = settings.TIMELINE_SIZE
+
+    def insert(timeline):
+        entries = [item for item in timeline['entries'] if item[1] != new[1]]
+        position = bisect_right(entries, new)
+        if position == len(entries) and not timeline['complete']:
+            # Пост за пределами окна, которое известно кешу.
+            return timeline
+        entries.insert(position, new)
+        if len(entries) > size:
+            del entries[size:]
+            timeline['complete'] = False
+        timeline['entries'] = entries
+        return timeline
+
+    change(keys, insert)
+
+
+def remove_post(post_id, keys):
+    """Удаляет пост из закешированных лент."""
+    def remove(timeline):
+        entries = [item for item in timeline['entries'] if item[1] != -post_id]
+        if not entries and not timeline['complete']:
+            return None
+        timeline['entries'] = entries
+        return timeline
+
+    change(keys, remove)
+
+
+def reset(keys):
+    """Сбрасывает ленты, в которые посты попали в обход сигналов."""
+    keys = list(keys)
+    cache.delete_many(keys + [count_key(key) for key in keys])
+
+
+class TimelineList:
+    """Последовательность постов ленты для `Paginator`.
+
+    Срезы внутри окна читаются одним запросом `id__in` по id из кеша,
+    остальные — обычным срезом queryset. Число постов неполного окна
+    хранится в кеше рядом с ним `TIMELINE_COUNT_TIMEOUT` секунд.
+    """
+
+    def __init__(self, key, queryset):
+        self.key = key
+        self.queryset = queryset
+        self._timeline = None
+
+    @property
+    def timeline(self):
+        if self._timeline is None:
+            self._timeline = get(self.key, self.queryset)
+        return self._timeline
+
+    def count(self):
+        if self.timeline['complete']:
+            return len(self.timeline['entries'])
+        key = count_key(self.key)
+        count = cache.get(key)
+        if count is None:
+            with primary_reads():
+                count = self.queryset.count()
+            cache.set(key, count, settings.TIMELINE_COUNT_TIMEOUT)
+        return count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        entries = self.timeline['entries']
+        stop = item.stop if item.stop is not None else len(entries) + 1
+        if stop > len(entries) and not self.timeline['complete']:
+            return list(self.queryset[item])
+        window = entries[item]
+        posts = self.queryset.in_bulk([-post_id for _, post_id in window])
+        result = []
+        for timestamp, post_id in window:
+            post = posts.get(-post_id)
+            if post is None or post.pub_date.timestamp() != -timestamp:
+                # Кеш разошёлся с базой: перечитываем окно.
+                self._timeline = load(self.key, self.queryset)
+                return list(self.queryset[item])
+            result.append(post)
+        return result
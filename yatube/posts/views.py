@@ -1,67 +1,205 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from django.views.decorators.vary import vary_on_headers
 
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User
+from .models import Follow, Group, Post, User
+from . import exporting, feed_cache, following, search, thumbnails
+from .paginators import CursorPaginator, TimelinePaginator
+from .timelines import TimelineList, author_key, group_key, GLOBAL_KEY
 
 
-def get_paginator(request, post_list):
-    paginator = Paginator(post_list, settings.DEFAULT_PAGINATE_BY)
+def get_paginator(request, post_list, timeline_key):
+    """Паджинатор ленты.
+
+    Если в запросе передан параметр `cursor`, используется курсорная
+    паджинация без `COUNT(*)` и `OFFSET`, иначе — постраничная. Первые
+    страницы берутся из кеша ленты `timeline_key`, а со страниц за его
+    окном лента листается курсором.
+    """
+    if 'cursor' in request.GET:
+        paginator = CursorPaginator(post_list, settings.DEFAULT_PAGINATE_BY)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = TimelinePaginator(
+        TimelineList(timeline_key, post_list),
+        settings.DEFAULT_PAGINATE_BY,
+        linked_pages=settings.TIMELINE_SIZE // settings.DEFAULT_PAGINATE_BY,
+    )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+@feed_cache.conditional(lambda: feed_cache.GLOBAL)
 def index(request):
     """Главная страница + паджинатор на 10 постов"""
     post_list = Post.objects.select_related('group', 'author')
-    page_obj = get_paginator(request, post_list)
+    page_obj = get_paginator(request, post_list, GLOBAL_KEY)
     context = {
         'page_obj': page_obj,
+        'feed_namespace': feed_cache.GLOBAL,
     }
     return render(request, 'posts/index.html', context)
 
 
+@feed_cache.conditional(feed_cache.group_namespace_by_slug)
 def group_posts(request, slug):
     """Страница группы + паджинатор на 10 постов"""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = get_paginator(request, post_list)
+    post_list = group.posts.select_related('group', 'author')
+    page_obj = get_paginator(request, post_list, group_key(group.id))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_namespace': feed_cache.group_namespace(group.id),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@feed_cache.conditional(feed_cache.author_namespace_by_username)
 def profile(request, username):
     """Профайл пользователя + паджинатор на 10 постов"""
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = get_paginator(request, post_list)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = author.posts.select_related('group', 'author')
+    page_obj = get_paginator(request, post_list, author_key(author.id))
+    is_following = (
+        request.user.is_authenticated
+        and request.user != author
+        and Follow.objects.filter(user=request.user, author=author).exists()
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
+        'feed_namespace': feed_cache.author_namespace(author.id),
+        'following': is_following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@login_required
+def follow_index(request):
+    """Посты авторов, на которых подписан пользователь"""
+    page_obj = following.get_page(
+        request.user, request.GET.get('cursor'), settings.DEFAULT_PAGINATE_BY
+    )
+    context = {
+        'page_obj': page_obj,
+        # Лента у каждого своя, поэтому страница целиком не кешируется.
+        'feed_namespace': '',
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+@require_POST
+@transaction.atomic
+def profile_follow(request, username):
+    """Подписка на автора"""
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username)
+
+
+@login_required
+@require_POST
+@transaction.atomic
+def profile_unfollow(request, username):
+    """Отписка от автора"""
+    Follow.objects.filter(
+        user=request.user, author__username=username
+    ).delete()
+    return redirect('posts:profile', username)
+
+
+def search_posts(request):
+    """Поиск по тексту постов + паджинатор на 10 постов"""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if search.query_terms(query):
+        # Курсорная паджинация опирается на сортировку постов и к
+        # ранжированной выдаче не подходит, поэтому параметр `cursor` здесь
+        # игнорируется.
+        paginator = Paginator(
+            search.ranked_post_ids(query), settings.DEFAULT_PAGINATE_BY
+        )
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.object_list = search.hydrate(page_obj.object_list)
+        thumbnails.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'query_string': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@feed_cache.conditional(feed_cache.post_namespaces)
 def post_detail(request, post_id):
     """Просмотр записи"""
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    return render_post_detail(request, post_id, None)
+
+
+def render_post_detail(request, post_id, cursor):
+    """Страница записи с порцией комментариев, начиная с `cursor`."""
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    thumbnails.prefetch([post])
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'comments': comments,
+        'comments': get_comments_page(post, cursor),
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def get_comments_page(post, cursor):
+    """Порция комментариев поста по курсору, вместе с авторами."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PAGINATE_BY,
+        ordering=('created', 'id'),
+    )
+    return paginator.get_page(cursor)
+
+
+@vary_on_headers('X-Requested-With')
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»
+
+    Скрипт страницы получает только список комментариев, а переход по
+    ссылке без скрипта — всю страницу записи с этой порцией.
+    """
+    if not request.is_ajax():
+        return render_post_detail(
+            request, post_id, request.GET.get('cursor')
+        )
+    return comment_list(request, post_id)
+
+
+@feed_cache.conditional(feed_cache.post_namespace)
+def comment_list(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     """Создание нового поста"""
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -74,10 +212,11 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     """Редактирование поста"""
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -91,6 +230,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -100,3 +240,46 @@ def add_comment(request, post_id):
         comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+def stream_export(request, posts, filename):
+    """Отдаёт выгрузку постов потоком, не собирая её в памяти."""
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in exporting.RENDERERS:
+        file_format = 'jsonl'
+    image_url = None
+    if request.GET.get('images'):
+        def image_url(image):
+            return request.build_absolute_uri(image.url)
+    records = exporting.export_records(
+        posts,
+        comments=bool(request.GET.get('comments')),
+        image_url=image_url,
+        chunk_size=settings.EXPORT_CHUNK_SIZE,
+    )
+    response = StreamingHttpResponse(
+        exporting.RENDERERS[file_format](records),
+        content_type=exporting.CONTENT_TYPES[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{file_format}"'
+    )
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    """Архив постов автора: для самого автора и модераторов"""
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    return stream_export(request, author.posts.all(), f'{username}-posts')
+
+
+@login_required
+def group_export(request, slug):
+    """Архив постов группы для модераторов"""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return stream_export(request, group.posts.all(), f'{slug}-posts')
@@ -50,11 +50,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.admission.WriteAdmissionMiddleware',
+    'core.middleware.replica.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,6 +94,84 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения лент: пути к файлам SQLite через запятую,
+# например DB_REPLICAS=replica1.sqlite3,replica2.sqlite3. Файлы
+# обновляются командой sync_replicas.
+REPLICA_DATABASES = []
+for number, name in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name.strip()),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Профили SQLite: `default` — настройки SQLite по умолчанию и новое
+# соединение на каждый запрос, `production` — режим для нескольких
+# процессов. Выбирается переменной окружения DB_PROFILE, в боевом окружении
+# нужно явно указать DB_PROFILE=production.
+SQLITE_PROFILES = {
+    'default': {
+        'conn_max_age': 0,
+        # Возвращает файл из WAL к обычному журналу.
+        'pragmas': {'journal_mode': 'DELETE'},
+    },
+    'production': {
+        'conn_max_age': 600,
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'busy_timeout': 5000,
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            # Отрицательное значение — размер в КиБ.
+            'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 20000)),
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+DB_PROFILE = os.environ.get('DB_PROFILE', 'default')
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = SQLITE_PROFILES[DB_PROFILE]['conn_max_age']
+
+# Через сколько секунд простоя соединение проверяется перед запросом
+DB_HEALTH_CHECK_INTERVAL = 30
+
+# Страницы, которые читают из реплик
+REPLICA_VIEWS = {
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:search',
+    'posts:api_index',
+    'posts:api_group_posts',
+    'posts:api_profile',
+    'posts:api_post_detail',
+    'posts:index_rss',
+    'posts:index_atom',
+    'posts:group_rss',
+    'posts:group_atom',
+    'posts:profile_rss',
+    'posts:profile_atom',
+}
+
+# Сколько секунд после изменяющего запроса пользователь читает из основной
+# базы, чтобы видеть свои записи раньше, чем они дойдут до реплик
+REPLICA_STICKY_SECONDS = 10
+
+# За сколько секунд изменение гарантированно доходит до реплик. Страница,
+# прочитанная из реплики, получает ETag и Last-Modified, только если её
+# версия старше этого срока: иначе реплика могла ещё не получить изменение,
+# и клиент закешировал бы устаревшую страницу под новой версией. None —
+# не выдавать валидаторы для страниц из реплик вовсе.
+REPLICA_MAX_LAG = REPLICA_STICKY_SECONDS
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,10 +219,25 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма складываются в очередь core.OutboxMessage, а доставляет их
+# команда send_outbox через OUTBOX_EMAIL_BACKEND (в продакшене — SMTP)
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+OUTBOX_EMAIL_BACKEND = os.environ.get(
+    'OUTBOX_EMAIL_BACKEND', 'django.core.mail.backends.filebased.EmailBackend'
+)
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Писем за одно соединение, попыток до отказа, пауза после первой
+# неудачи (дальше удваивается до OUTBOX_RETRY_MAX), на сколько секунд
+# пачка закрепляется за обработчиком и сколько хранить отправленные
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE = 30
+OUTBOX_RETRY_MAX = 60 * 60
+OUTBOX_LEASE = 60 * 5
+OUTBOX_KEEP_SENT = 60 * 60 * 24 * 7
+
 DEFAULT_PAGINATE_BY = 10
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -150,8 +246,135 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Картинки постов при загрузке: предельный размер файла и число пикселей
+# исходника, длинная сторона после уменьшения и формат перекодирования
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_MAX_SIDE = 1920
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 82
+
+# Файл картинки, загруженный или переиспользованный за это число секунд,
+# не удаляется, даже если на него пока не ссылается ни один пост
+MEDIA_RELEASE_GRACE = 600
+
+# Кеш, общий для всех процессов: адреса memcached через запятую в
+# переменной окружения CACHE_LOCATION. Без неё у каждого процесса свой
+# LocMemCache, и изменения, сделанные в других процессах, до него не
+# доходят: сроки хранения лент и фрагментов сокращаются до минуты.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+SHARED_CACHE = bool(CACHE_LOCATION)
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION.split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# Сколько последних постов каждой ленты хранится в кеше, сколько секунд
+# окно живёт после загрузки из базы и сколько хранится число постов ленты
+TIMELINE_SIZE = 200
+TIMELINE_TIMEOUT = 60 * 60 if SHARED_CACHE else 60
+TIMELINE_COUNT_TIMEOUT = 60
+
+# Подписчикам не больше чем на столько авторов лента собирается слиянием
+# лент авторов, остальным — отдельным списком, пополняемым при публикации
+FOLLOW_MERGE_MAX_AUTHORS = 50
+
+# Потоки для фоновой подготовки миниатюр; 0 — создавать в запросе
+THUMBNAIL_WORKERS = 2
+
+# Сколько готовых миниатюр держать в памяти процесса
+THUMBNAIL_LRU_SIZE = 2000
+
+COMMENTS_PAGINATE_BY = 50
+
+# Сколько секунд хранить фрагмент ленты: ключ фрагмента меняется вместе
+# с версией ленты, но без общего кеша версии у процессов свои
+FEED_FRAGMENT_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else 60
+
+# Сколько записей в RSS/Atom и сколько секунд хранить готовый XML
+FEED_SIZE = 20
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else 60
+
+# Сколько секунд хранить отрисованный блок поста в ленте: ключ блока
+# меняется вместе с постом, поэтому срок нужен только для вытеснения
+POST_BLOCK_TIMEOUT = 60 * 60 * 24
+
+# Сколько постов читать из базы за раз при выгрузке архива
+EXPORT_CHUNK_SIZE = 500
+
+# Журнал изменений: сколько событий читать за запрос к базе, сколько
+# отдавать за один ответ API и токен для клиентов синхронизации
+# (заголовок Authorization: Bearer <токен>); пустой токен — только staff
+CHANGES_BATCH_SIZE = 1000
+CHANGES_MAX_LIMIT = 10000
+CHANGES_API_TOKEN = os.environ.get('CHANGES_API_TOKEN', '')
+
+# Частота изменяющих запросов по имени URL: N запросов за s/m/h/d на
+# пользователя, для анонимов — на IP. Сверх неё — ответ 429
+THROTTLE_RATES = {
+    'posts:post_create': '10/m',
+    'posts:post_edit': '30/m',
+    'posts:add_comment': '20/m',
+}
+
+# Сколько изменяющих запросов к WRITE_LIMITED_VIEWS одновременно
+# допускается во всех процессах (0 — без ограничения), сколько секунд
+# ждать места, прежде чем ответить 503, что советовать в Retry-After и
+# через сколько секунд место, не освобождённое после ответа, истекает
+WRITE_CONCURRENCY = 2
+WRITE_QUEUE_TIMEOUT = 0.05
+WRITE_RETRY_AFTER = 1
+WRITE_SLOT_LEASE = 30
+WRITE_LIMITED_VIEWS = {
+    'posts:post_create',
+    'posts:post_edit',
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+}
+
+# Наибольшее число SQL-запросов на страницу по имени URL, у потоковых
+# ответов — вместе с отдачей тела. Превышение пишется в лог, а тесты
+# posts/tests/test_query_budgets.py падают.
+QUERY_BUDGETS = {
+    # В бюджет лент групп и авторов входит поиск id по slug или username,
+    # пока он не закеширован
+    'posts:index': 5,
+    'posts:group_list': 7,
+    'posts:profile': 7,
+    'posts:post_detail': 5,
+    # Без скрипта ссылка на комментарии открывает всю страницу записи
+    'posts:post_comments': 5,
+    'posts:search': 6,
+    'posts:follow_index': 6,
+    # В бюджет записи входит сохранение окна чтения из основной базы в сессии
+    # и событие журнала изменений
+    'posts:post_create': 14,
+    'posts:post_edit': 13,
+    'posts:add_comment': 7,
+    'posts:api_index': 1,
+    'posts:api_group_posts': 3,
+    'posts:api_profile': 3,
+    'posts:api_post_detail': 2,
+    # Сессия и пользователь плюс пачка на каждые CHANGES_BATCH_SIZE событий
+    # при наибольшем limit
+    'posts:api_changes': 12,
+    'posts:index_rss': 1,
+    'posts:index_atom': 1,
+    'posts:group_rss': 3,
+    'posts:group_atom': 3,
+    'posts:profile_rss': 3,
+    'posts:profile_atom': 3,
 }
+
+# Отдавать ли счётчики запросов в заголовках X-DB-*
+QUERY_BUDGET_HEADERS = DEBUG